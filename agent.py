@@ -1,5 +1,8 @@
+import argparse
 import os
 import sys
+import threading
+import uuid
 from typing import List, TypedDict, Annotated, Optional
 from dotenv import load_dotenv
 
@@ -9,27 +12,42 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+load_dotenv()
+
+# Record/replay all network traffic when AGENT_NET_MODE is set (must run before the tools create their clients)
+from src.cassette import install_from_env
+install_from_env()
 
 from tools.calculator import add, subtract, multiply, divide # Importing calculator functions
 from tools.wiki_search import wiki_search # Importing wiki search tool
 from tools.web_search import web_search # Corrected import alias if needed, or use web_search_tool directly
+from tools.arxiv_search import arxiv_search, arxiv_fetch_paper
 from tools.analyze_csv import analyze_csv 
 from tools.analyze_excel import analyze_excel
 from tools.download_file import download_file
+from tools.fetch_url import fetch_url
 from tools.analyze_image import analyze_image
 from tools.analyze_audio import analyze_audio
+from tools.analyze_pdf import analyze_pdf
+from tools.analyze_file import analyze_file
+from tools.run_python import run_python, sandbox_pool
+from tools.chess_solver import solve_chess_position
 from tools.analyze_youtube import answer_question_about_youtube_video # Importing YouTube analysis toolS
-#switch to using gemini 2.0 model 
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph.message import add_messages
 from langgraph.graph import START, StateGraph, MessagesState
 from langgraph.prebuilt import ToolNode, tools_condition
+from src.prefetch import prefetch_question
+from src.router import route_question
+from src.ensemble import run_agent
+from src.checkpoints import get_checkpointer
+from src.workspace import task_workspace
+from src.models import get_llm, tier_for, escalation_reason, latency_summary_text
+from src.profiling import profile_question, profiled_tool, add_profile_arguments, configure as configure_profiling
 
 
 
-load_dotenv()
-
 tools = [
     add,
     subtract,
@@ -37,12 +55,21 @@ tools = [
     divide,
     wiki_search,
     web_search,
+    fetch_url,
+    arxiv_search,
+    arxiv_fetch_paper,
     analyze_csv,
     analyze_excel,
     download_file,
     analyze_image,
     analyze_audio,
+    analyze_pdf,
+    analyze_file,
+    run_python,
+    solve_chess_position,
     answer_question_about_youtube_video,]
+# Tools run in worker threads; this lets a question's profile follow them there
+tools = [profiled_tool(t) for t in tools]
 
 with open("system_prompt.txt", "r", encoding="utf-8") as f:
     system = f.read()
@@ -54,31 +81,52 @@ class AgentState(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages] #contains the messages exchanged between the user and the agent
 
 
-def create_agent(): #build graph
+def create_agent(tool_names: Optional[List[str]] = None): #build graph
+    """Builds the ReAct graph, binding only the tools in tool_names (all tools if None)."""
     try:
-        llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash")
+        # Fast model for every turn; the strong one only redoes turns whose answer fails the checks
+        llm = get_llm(tier_for("assistant"))
+        escalation_llm = get_llm(tier_for("escalation"))
     except Exception as e:
         print(f"Error initializing LLM: {e}")
         return None 
         
     try:
-        llm_with_tools = llm.bind_tools(tools)
+        selected_tools = [t for t in tools if t.name in tool_names] if tool_names else tools
+        llm_with_tools = llm.bind_tools(selected_tools)
+        escalation_llm_with_tools = escalation_llm.bind_tools(selected_tools)
+        if run_python in selected_tools:
+            sandbox_pool.start() # warm the interpreters up before the model asks for one
 
         def assistant(state: MessagesState):
             """Assistant node"""
             response = llm_with_tools.invoke(state["messages"])
+            reason = escalation_reason(response)
+            if reason:
+                print(f"Escalating to {tier_for('escalation')} model: {reason}")
+                response = escalation_llm_with_tools.invoke(state["messages"])
+            return {"messages": [response]}
+
+        async def aassistant(state: MessagesState):
+            """Async assistant node, so ensemble runs can be cancelled mid-call"""
+            response = await llm_with_tools.ainvoke(state["messages"])
+            reason = escalation_reason(response)
+            if reason:
+                print(f"Escalating to {tier_for('escalation')} model: {reason}")
+                response = await escalation_llm_with_tools.ainvoke(state["messages"])
             return {"messages": [response]}
 
         builder = StateGraph(MessagesState)
-        builder.add_node("assistant", assistant)
-        builder.add_node("tools", ToolNode(tools))
+        builder.add_node("assistant", RunnableLambda(assistant, afunc=aassistant))
+        builder.add_node("tools", ToolNode(selected_tools))
         builder.add_edge(START, "assistant")
         builder.add_conditional_edges(
             "assistant",
             tools_condition,
         )
         builder.add_edge("tools", "assistant")
-        react_graph = builder.compile()
+        # State is persisted after every assistant/tools step, so interrupted questions can resume
+        react_graph = builder.compile(checkpointer=get_checkpointer())
 
         return react_graph
     except Exception as e:
@@ -86,28 +134,63 @@ def create_agent(): #build graph
         return None
 
 
+# Compiled graphs keyed by their bound tool subset (None = all tools), shared across questions
+_agent_variants = {}
+_agent_variants_lock = threading.Lock()
+
+
+def get_agent(tool_names: Optional[List[str]] = None):
+    """Returns the compiled graph for a tool subset, building it on first use."""
+    key = frozenset(tool_names) if tool_names else None
+    with _agent_variants_lock:
+        if _agent_variants.get(key) is None:
+            _agent_variants[key] = create_agent(sorted(key) if key else None)
+        return _agent_variants[key]
+
+
+def get_routed_agent(question: str, file_path: Optional[str] = None):
+    """Returns a graph with only the tools relevant to the question bound."""
+    tool_names = route_question(question, file_path)
+    if tool_names:
+        print(f"Routing question to tools: {', '.join(tool_names)}")
+    return get_agent(tool_names) or get_agent()
+
+
+def answer_question(question: str, file_path: Optional[str] = None, label: str = "question",
+                    thread_id: Optional[str] = None):
+    """
+    Answers one question with the shared graphs and returns (reply content, votes).
+
+    Thread-safe: the batch evaluator, the serving workers and the CLI all go through here.
+    Passing the same thread_id again resumes a question that was interrupted. Files the
+    tools create go to the thread's workspace, which is removed once the question is answered.
+    """
+    thread_id = thread_id or uuid.uuid4().hex
+    with task_workspace(thread_id):
+        prefetch_question(question, file_path) # start fetching linked videos/files in the background
+        if file_path:
+            question = (question + " The file needed for this task is downloaded and saved locally to: " + file_path
+                        + ". Read this file to process its content (analyze_file detects its type automatically).")
+        # Construct the initial messages list including the system prompt
+        initial_messages = [system_message, HumanMessage(content=question)]
+        # Bind only the tools the question needs (several concurrent runs with voting when AGENT_ENSEMBLE_SIZE > 1)
+        with profile_question(label): # no-op unless profiling is enabled
+            return run_agent(get_routed_agent(question, file_path), initial_messages, thread_id=thread_id)
+
+
 def main(): # Define an async main function
-    agent = create_agent()
+    agent = get_agent()
     if agent:
         print("\nAgent ready. Enter your query (or type 'quit' to exit):")
+        query_count = 0
         while True:
             try:
                 query = input("> ") # input() is blocking, consider aioconsole for fully async input if needed
                 if query.lower() == 'quit':
                     break
                 if query:
-                    # Assuming agent.run is the correct async method for FunctionAgent
-                    # Construct the initial messages list including the system prompt
-                    initial_messages = [
-                        system_message, # Include the system prompt read earlier
-                        HumanMessage(content=query)
-                    ]
-                    # Invoke the agent with the messages state
-                    response = agent.invoke({"messages": initial_messages})
-
-                    # The final response from the graph is in the 'messages' list
-                    # Get the last message, which should be the AI's response
-                    answer = response["messages"][-1].content
+                    query_count += 1
+                    answer, _ = answer_question(query, label=f"query-{query_count}")
                     # Print only the final answer without the "Agent: " prefix
                     print(answer)
             except EOFError:
@@ -117,12 +200,17 @@ def main(): # Define an async main function
                 break
             except Exception as e:
                 print(f"An error occurred during chat: {e}")
+        print(f"Model latency: {latency_summary_text()}")
         print("Exiting agent chat.")
     else:
         print("Agent creation failed.")
 
 #write a simple test here to check if the agent is working as expected
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Interactive chat with the agent.")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    configure_profiling(args.profile, args.profile_dir)
     try:
         main() # Run the async main function
     except KeyboardInterrupt:
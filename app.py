@@ -1,26 +1,92 @@
+import argparse
 import os
 import gradio as gr
 import requests
 import re
-import tempfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Optional
 import pandas as pd
-from agent import create_agent 
-from langchain_core.messages import SystemMessage, HumanMessage 
+from agent import get_agent, answer_question
 from tools.download_file import download_file
+from src.cassette import install_from_env, save_cassette
+from src.filetypes import ensure_extension
+from src.answers import extract_final_answer
+from src.models import latency_summary_text
+from src.profiling import add_profile_arguments, configure as configure_profiling
+from src.serving import FairScheduler, QueueFullError, SERVE_CONCURRENCY, SERVE_QUEUE_SIZE
+from src.workspace import Workspace, WorkspaceQuotaError, task_workspace
 
 
 DEFAULT_API_URL = "https://agents-course-unit4-scoring.hf.space"
 
+install_from_env() # no-op unless AGENT_NET_MODE=record|replay
+
+# Every question (batch or single) goes through this queue: AGENT_SERVE_CONCURRENCY at a time,
+# taken round-robin across users
+scheduler = FairScheduler()
+# Each running "Ask" event holds a Gradio worker thread while its question waits in the
+# scheduler, so only this many may run; further events wait in Gradio's bounded queue
+ASK_CONCURRENCY_LIMIT = SERVE_CONCURRENCY + SERVE_QUEUE_SIZE
+# Handlers waiting on the scheduler yield a status this often, so Gradio can stop them
+# (user left or pressed Cancel) while their jobs are still queued
+PROGRESS_POLL_SECONDS = 2.0
+
+def fetch_task_file(api_url: str, task_id: str, workspace: Workspace, file_name: Optional[str] = None) -> Optional[str]:
+    """Downloads the file attached to a task, if any, into the task's workspace and returns its local path."""
+    files_url = f"{api_url}/files/{task_id}"
+    try:
+        file_response = requests.get(files_url, timeout=10)
+        if file_response.status_code == 200:
+            disposition = file_response.headers.get("content-disposition", "")
+            match = re.search(r'filename="([^"]+)"', disposition)
+            if match:
+                file_name = match.group(1)
+            # Keep the original name and extension so the file type is obvious to the agent and the prefetcher
+            path = workspace.add_bytes(file_name or task_id, file_response.content)
+            print(f"Task {task_id}: Found associated file")
+            # Name extension-less attachments after their sniffed type so the right analyzer is used
+            return ensure_extension(path)
+        elif file_response.status_code == 404:
+            print(f"Task {task_id}: No associated file found.")
+        else:
+            # Log other non-404 errors but don't stop the process
+            print(f"Task {task_id}: Warning - Error checking for file")
+    except requests.exceptions.RequestException as file_err:
+        print(f"Task {task_id}: Warning - Network error checking for file: {file_err}")
+    except WorkspaceQuotaError as quota_err:
+        # The question is still answered, just without its attachment
+        print(f"Task {task_id}: Warning - No disk space for the file: {quota_err}")
+    return None
+
+
+def run_task(api_url: str, username: str, item: dict):
+    """
+    Answers one evaluation task in its own workspace (runs on a scheduler worker) and
+    returns (answer, votes, file fetch seconds, agent seconds).
+    """
+    task_id = item["task_id"]
+    # Checkpoints and workspaces are keyed per user and task, so rerunning after a crash resumes unfinished tasks
+    thread_id = f"{username}:{task_id}"
+    start = time.perf_counter()
+    # The task's files are removed once it is answered
+    with task_workspace(thread_id) as workspace:
+        file_path = fetch_task_file(api_url, task_id, workspace, item.get("file_name"))
+        fetch_seconds = time.perf_counter() - start
+        agent_start = time.perf_counter()
+        # Profiled per task when AGENT_PROFILE or --profile is set
+        answer, votes = answer_question(item["question"], file_path, task_id, thread_id)
+    return answer, votes, fetch_seconds, time.perf_counter() - agent_start
 
-with open("system_prompt.txt", "r", encoding="utf-8") as f:
-    system = f.read()
-
-system_message = SystemMessage(content=system)
 
 def run_and_submit_all( profile: gr.OAuthProfile | None):
     """
     Fetches all questions, runs the BasicAgent on them, submits all answers,
     and displays the results.
+
+    This is a generator: it yields (status, results table) after every question so the
+    UI shows progress as it happens and a cancelled run keeps the answers produced so far.
     """
     # --- Determine HF Space Runtime URL and Repo URL ---
     space_id = os.getenv("SPACE_ID") # Get the SPACE_ID for sending link to the code
@@ -30,21 +96,24 @@ def run_and_submit_all( profile: gr.OAuthProfile | None):
         print(f"User logged in: {username}")
     else:
         print("User not logged in.")
-        return "Please Login to Hugging Face with the button.", None
+        yield "Please Login to Hugging Face with the button.", None
+        return
 
     api_url = DEFAULT_API_URL
     questions_url = f"{api_url}/questions"
     submit_url = f"{api_url}/submit"
 
-
+    yield "Creating agent...", None
     try:
-        agent = create_agent()
+        agent = get_agent()
         if agent is None:
-            return "Failed to create agent. Check console logs for details (e.g., Ollama running?).", None
+            yield "Failed to create agent. Check console logs for details (e.g., Ollama running?).", None
+            return
         print("Agent created successfully.")
     except Exception as e:
         print(f"Unexpected error during agent instantiation: {e}")
-        return f"Unexpected error initializing agent: {e}", None
+        yield f"Unexpected error initializing agent: {e}", None
+        return
 
     # In the case of an app running as a hugging Face space, this link points toward your codebase ( usefull for others so please keep it public)
     agent_code = f"https://huggingface.co/spaces/{space_id}/tree/main"
@@ -58,101 +127,118 @@ def run_and_submit_all( profile: gr.OAuthProfile | None):
         questions_data = response.json()
         if not questions_data:
              print("Fetched questions list is empty.")
-             return "Fetched questions list is empty or invalid format.", None
+             yield "Fetched questions list is empty or invalid format.", None
+             return
         print(f"Fetched {len(questions_data)} questions.")
     except requests.exceptions.RequestException as e:
         print(f"Error fetching questions: {e}")
-        return f"Error fetching questions: {e}", None
+        yield f"Error fetching questions: {e}", None
+        return
     except requests.exceptions.JSONDecodeError as e:
          print(f"Error decoding JSON response from questions endpoint: {e}")
          print(f"Response text: {response.text[:500]}")
-         return f"Error decoding server response for questions: {e}", None
+         yield f"Error decoding server response for questions: {e}", None
+         return
     except Exception as e:
         print(f"An unexpected error occurred fetching questions: {e}")
-        return f"An unexpected error occurred fetching questions: {e}", None
+        yield f"An unexpected error occurred fetching questions: {e}", None
+        return
 
     # 3. Run your Agent
     results_log = []
     answers_payload = []
-    print(f"Running agent on {len(questions_data)} questions...")
+    total_questions = len(questions_data)
+    run_start = time.perf_counter()
+    print(f"Running agent on {total_questions} questions...")
+    yield f"Fetched {total_questions} questions. Running agent...", pd.DataFrame(results_log)
+    # All tasks are handed to the scheduler up front (as many as the per-user cap lets wait),
+    # so they run AGENT_SERVE_CONCURRENCY at a time, interleaved with other users' questions
+    tasks = []
     for item in questions_data:
-        task_id = item.get("task_id")
-        question_text = item.get("question")
-        if not task_id or question_text is None:
+        if not item.get("task_id") or item.get("question") is None:
             print(f"Skipping item with missing task_id or question: {item}")
             continue
-        try:
-            # --- Check for associated file ---
-            file_path = None
-            files_url = f"{api_url}/files/{task_id}"
+        tasks.append(item)
+    backlog = deque(tasks)
+    futures = {} # future -> (task item, submission time)
+
+    def submit_more():
+        """Submits waiting tasks until the user's scheduler queue is full."""
+        while backlog:
             try:
-                file_response = requests.get(files_url, timeout=10)
-                if file_response.status_code == 200:
-                    file = response.headers.get("content-disposition", "")
-                    match = re.search(r'filename="([^"]+)"', file)
-                    if match:
-                        filename = match.group(1)
-
-                    #save file to a temporary location
-                    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                        temp_file.write(file_response.content)
-                        file_path = temp_file.name
-
-                    file_prompt = "The file needed for this task is downloaded and saved locally to: " + file_path + ".Read this file to process its content."
-
-
-                    print(f"Task {task_id}: Found associated file")
-                elif file_response.status_code == 404:
-                    print(f"Task {task_id}: No associated file found.")
-                else: 
-                    # Log other non-404 errors but don't stop the process
-                    print(f"Task {task_id}: Warning - Error checking for file")
-            except requests.exceptions.RequestException as file_err:
-                print(f"Task {task_id}: Warning - Network error checking for file: {file_err}")
-
-            question_text = question_text + " " + file_prompt if file_path else question_text
-
-            # --- Prepare agent input ---
-            agent_input = {
-                "messages": [system_message, HumanMessage(content=question_text)]
-            }
-
-
-            # --- Invoke Agent ---
-            agent_response = agent.invoke(agent_input)
-            answer = agent_response['messages'][-1].content
-
-            # --- Process Answer ---
-            match = re.search(r"FINAL ANSWER:.*", answer, flags=re.IGNORECASE)
-            answer_line = match.group(0).strip() if match else answer.strip()
-            answer_line = answer_line.replace("FINAL ANSWER:", "").strip()  # Clean up the answer
-    
-            submitted_answer = answer_line # Extract string response
-
-            # response_dict = agent.invoke({"input": question_text})
-            # # Extract the answer, handling potential missing key
-            # submitted_answer = response_dict.get("output", f"AGENT ERROR: No 'output' key in response: {response_dict}")
-            answers_payload.append({"task_id": task_id, "submitted_answer": submitted_answer})
-            print(f"Task ID: {task_id}, Question: {question_text}, Submitted Answer: {submitted_answer}")
-            results_log.append({"Task ID": task_id, "Question": question_text, "Submitted Answer": submitted_answer})
-        except Exception as e:
-              print(f"Error running agent on task {task_id}: {e}")
-              # Log the error but continue if possible
-              results_log.append({"Task ID": task_id, "Question": question_text, "Submitted Answer": f"AGENT ERROR: {e}"})
-              # Optionally add a placeholder answer to submit anyway, or skip submission for this task
-              # answers_payload.append({"task_id": task_id, "submitted_answer": "AGENT ERROR"})
+                future = scheduler.submit(username, run_task, api_url, username, backlog[0])
+            except QueueFullError:
+                return # the rest follow as this user's tasks finish
+            futures[future] = (backlog.popleft(), time.perf_counter())
+
+    submit_more()
+    answered = 0
+    try:
+        while futures or backlog:
+            if not futures: # the user's queue is full of questions asked in the other tab
+                time.sleep(PROGRESS_POLL_SECONDS)
+            done, _ = wait(futures, timeout=PROGRESS_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                item, submitted = futures.pop(future)
+                task_id, question_text = item["task_id"], item["question"]
+                try:
+                    answer, votes, fetch_seconds, agent_seconds = future.result()
+                    submitted_answer = extract_final_answer(answer)
+                    answers_payload.append({"task_id": task_id, "submitted_answer": submitted_answer})
+                    print(f"Task ID: {task_id}, Question: {question_text}, Submitted Answer: {submitted_answer}")
+                    results_log.append({
+                        "Task ID": task_id,
+                        "Question": question_text,
+                        "Submitted Answer": submitted_answer,
+                        "Votes": votes,
+                        "File Fetch (s)": round(fetch_seconds, 2),
+                        "Agent (s)": round(agent_seconds, 2),
+                        "Total (s)": round(time.perf_counter() - submitted, 2),
+                    })
+                except Exception as e:
+                    print(f"Error running agent on task {task_id}: {e}")
+                    # Log the error but continue with the other tasks
+                    results_log.append({
+                        "Task ID": task_id,
+                        "Question": question_text,
+                        "Submitted Answer": f"AGENT ERROR: {e}",
+                        "Votes": None,
+                        "File Fetch (s)": None,
+                        "Agent (s)": None,
+                        "Total (s)": round(time.perf_counter() - submitted, 2),
+                    })
+                answered += 1
+            submit_more()
+
+            # Yielding also on timeouts lets Gradio stop the run while tasks are still queued
+            elapsed = time.perf_counter() - run_start
+            average = f" ({elapsed / answered:.1f}s per question on average)" if answered else ""
+            yield (
+                f"Answered {answered}/{len(tasks)} questions in {elapsed:.1f}s{average}; "
+                f"{scheduler.running()} running, {scheduler.waiting(username)} of yours waiting...",
+                pd.DataFrame(results_log),
+            )
+    finally:
+        for future in futures:
+            future.cancel() # drops the tasks that had not started when the run was stopped
+
+    save_cassette() # persist recorded traffic even if the submission below fails
 
     if not answers_payload:
         print("Agent did not produce any answers to submit.")
-        return "Agent did not produce any answers to submit.", pd.DataFrame(results_log)
+        yield "Agent did not produce any answers to submit.", pd.DataFrame(results_log)
+        return
 
     # 4. Prepare Submission 
     submission_data = {"username": username.strip(), "agent_code": agent_code, "answers": answers_payload}
     status_update = f"Agent finished. Submitting {len(answers_payload)} answers for user '{username}'..."
+    print(f"Model latency: {latency_summary_text()}")
     print(status_update)
+    yield status_update, pd.DataFrame(results_log)
 
     # 5. Submit
     print(f"Submitting {len(answers_payload)} answers to: {submit_url}")
+    results_df = pd.DataFrame(results_log)
     try:
         response = requests.post(submit_url, json=submission_data, timeout=60)
         response.raise_for_status()
@@ -162,11 +248,11 @@ def run_and_submit_all( profile: gr.OAuthProfile | None):
             f"User: {result_data.get('username')}\n"
             f"Overall Score: {result_data.get('score', 'N/A')}% "
             f"({result_data.get('correct_count', '?')}/{result_data.get('total_attempted', '?')} correct)\n"
-            f"Message: {result_data.get('message', 'No message received.')}"
+            f"Message: {result_data.get('message', 'No message received.')}\n"
+            f"Model latency: {latency_summary_text()}"
         )
         print("Submission successful.")
-        results_df = pd.DataFrame(results_log)
-        return final_status, results_df
+        yield final_status, results_df
     except requests.exceptions.HTTPError as e:
         error_detail = f"Server responded with status {e.response.status_code}."
         try:
@@ -176,23 +262,46 @@ def run_and_submit_all( profile: gr.OAuthProfile | None):
             error_detail += f" Response: {e.response.text[:500]}"
         status_message = f"Submission Failed: {error_detail}"
         print(status_message)
-        results_df = pd.DataFrame(results_log)
-        return status_message, results_df
+        yield status_message, results_df
     except requests.exceptions.Timeout:
         status_message = "Submission Failed: The request timed out."
         print(status_message)
-        results_df = pd.DataFrame(results_log)
-        return status_message, results_df
+        yield status_message, results_df
     except requests.exceptions.RequestException as e:
         status_message = f"Submission Failed: Network error - {e}"
         print(status_message)
-        results_df = pd.DataFrame(results_log)
-        return status_message, results_df
+        yield status_message, results_df
     except Exception as e:
         status_message = f"An unexpected error occurred during submission: {e}"
         print(status_message)
-        results_df = pd.DataFrame(results_log)
-        return status_message, results_df
+        yield status_message, results_df
+
+
+def ask_question(question: str, file_path: Optional[str], profile: gr.OAuthProfile | None, request: gr.Request):
+    """Answers a single free-form question, queued fairly with everyone else's. Yields status text."""
+    if not question or not question.strip():
+        yield "Please enter a question."
+        return
+    # Logged-in users share one queue across their sessions; anonymous visitors get one per session
+    user = profile.username if profile else f"session-{request.session_hash}"
+    try:
+        future = scheduler.submit(user, answer_question, question.strip(), file_path or None, f"ask-{user}-{int(time.time())}")
+    except QueueFullError as e:
+        yield f"Too many questions waiting: {e}. Please try again later."
+        return
+    try:
+        # Polling (not one blocking result() call) lets Gradio close this generator when the
+        # user leaves, so the finally below can still drop a job that has not started
+        while not future.done():
+            state = "Running" if future.running() else f"Queued ({scheduler.waiting()} waiting, {scheduler.running()} running)"
+            yield f"{state}..."
+            wait([future], timeout=PROGRESS_POLL_SECONDS)
+        answer, votes = future.result()
+        yield f"{extract_final_answer(answer)}\n\n(votes: {votes})"
+    except Exception as e:
+        yield f"Error answering the question: {e}"
+    finally:
+        future.cancel() # drops the job if the user left before it started
 
 
 # --- Build Gradio Interface using Blocks ---
@@ -215,18 +324,45 @@ with gr.Blocks() as demo:
 
     gr.LoginButton()
 
-    run_button = gr.Button("Run Evaluation & Submit All Answers")
-
-    status_output = gr.Textbox(label="Run Status / Submission Result", lines=5, interactive=False)
-    # Removed max_rows=10 from DataFrame constructor
-    results_table = gr.DataFrame(label="Questions and Agent Answers", wrap=True)
-
-    run_button.click(
+    with gr.Tab("Evaluation"):
+        with gr.Row():
+            run_button = gr.Button("Run Evaluation & Submit All Answers")
+            cancel_button = gr.Button("Cancel Run", variant="stop")
+
+        status_output = gr.Textbox(label="Run Status / Submission Result", lines=5, interactive=False)
+        # Removed max_rows=10 from DataFrame constructor
+        results_table = gr.DataFrame(label="Questions and Agent Answers", wrap=True)
+
+    with gr.Tab("Ask a question"):
+        question_input = gr.Textbox(label="Question", lines=3)
+        file_input = gr.File(label="Attachment (optional)", type="filepath")
+        ask_button = gr.Button("Ask")
+        answer_output = gr.Textbox(label="Answer", lines=4, interactive=False)
+        serving_stats = gr.Textbox(label="Queue statistics", interactive=False)
+
+    # run_and_submit_all is a generator, so the table fills in as each question finishes.
+    # One batch at a time; the scheduler interleaves its questions with single questions.
+    run_event = run_button.click(
         fn=run_and_submit_all,
-        outputs=[status_output, results_table]
+        outputs=[status_output, results_table],
+        concurrency_limit=1,
     )
+    # Stops the run; the rows already shown in the table are kept
+    cancel_button.click(fn=None, inputs=None, outputs=None, cancels=[run_event])
+    ask_event = ask_button.click(
+        fn=ask_question,
+        inputs=[question_input, file_input],
+        outputs=answer_output,
+        concurrency_limit=ASK_CONCURRENCY_LIMIT,
+    )
+    ask_event.then(fn=scheduler.stats_text, outputs=serving_stats)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gradio app for running and submitting the agent.")
+    add_profile_arguments(parser)
+    args, _ = parser.parse_known_args()
+    configure_profiling(args.profile, args.profile_dir)
+
     print("\n" + "-"*30 + " App Starting " + "-"*30)
     # Check for SPACE_HOST and SPACE_ID at startup for information
     space_host_startup = os.getenv("SPACE_HOST")
@@ -247,5 +383,7 @@ if __name__ == "__main__":
 
     print("-"*(60 + len(" App Starting ")) + "\n")
 
+    get_agent() # compile the shared graph once, before the first users arrive
     print("Launching Gradio Interface for Basic Agent Evaluation...")
-    demo.launch(debug=True, share=False)
\ No newline at end of file
+    # Enough threads for every running "Ask" event plus the batch run and quick UI events
+    demo.queue(max_size=SERVE_QUEUE_SIZE).launch(debug=True, share=False, max_threads=ASK_CONCURRENCY_LIMIT + 8)
\ No newline at end of file
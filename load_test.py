@@ -0,0 +1,137 @@
+"""
+Load test for the serving mode, run against a stubbed LLM (no API keys or network needed).
+
+Simulated users send questions through the same FairScheduler and shared graphs the
+Gradio app uses. One of them submits a whole batch at once, like the evaluation
+button; the others ask single questions with some think time in between.
+Queue wait and latency percentiles are reported at the end.
+
+    python load_test.py --users 8 --questions 5 --batch 20 --concurrency 4 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import src.models
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model that sleeps like a remote call, optionally calls a tool, then answers "42"."""
+
+    latency: float = 0.5
+    tool_calls: int = 1
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _delay(self) -> float:
+        return max(0.0, random.gauss(self.latency, self.latency * 0.2))
+
+    def _reply(self, messages) -> ChatResult:
+        if sum(isinstance(m, ToolMessage) for m in messages) < self.tool_calls:
+            message = AIMessage(content="", tool_calls=[
+                {"name": "add", "args": {"a": 40, "b": 2}, "id": f"call_{uuid.uuid4().hex[:8]}"}
+            ])
+        else:
+            message = AIMessage(content="FINAL ANSWER: 42")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self._delay())
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self._delay())
+        return self._reply(messages)
+
+
+def simulate_user(scheduler, answer_question, user, questions, think_time, latencies, lock):
+    for number in range(questions):
+        start = time.perf_counter()
+        scheduler.submit(user, answer_question, f"What is 40 plus 2? (question {number})", None, f"{user}-{number}").result()
+        with lock:
+            latencies.setdefault(user, []).append(time.perf_counter() - start)
+        time.sleep(random.expovariate(1 / think_time) if think_time > 0 else 0)
+
+
+def simulate_batch(scheduler, answer_question, user, questions, latencies, lock):
+    start = time.perf_counter()
+    futures = [
+        scheduler.submit(user, answer_question, f"What is 40 plus 2? (batch {number})", None, f"{user}-{number}")
+        for number in range(questions)
+    ]
+    for future in futures:
+        future.result()
+        with lock:
+            latencies.setdefault(user, []).append(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent users against a stubbed LLM.")
+    parser.add_argument("--users", type=int, default=8, help="users asking single questions")
+    parser.add_argument("--questions", type=int, default=5, help="questions per single-question user")
+    parser.add_argument("--batch", type=int, default=20, help="questions submitted at once by a batch user (0 = none)")
+    parser.add_argument("--concurrency", type=int, default=4, help="scheduler workers")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="mean seconds per stubbed LLM call")
+    parser.add_argument("--tool-calls", type=int, default=1, help="tool round trips before each answer")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds between a user's questions")
+    args = parser.parse_args()
+
+    # No real model calls: every get_llm() returns the stub (must happen before agent is imported)
+    os.environ.setdefault("GOOGLE_API_KEY", "load-test")
+    os.environ.setdefault("TAVILY_API_KEY", "load-test")
+    os.environ.setdefault("RUN_PYTHON_POOL_SIZE", "0")
+    stub = StubChatModel(latency=args.llm_latency, tool_calls=args.tool_calls)
+    src.models.get_llm = lambda tier, **kwargs: stub
+    from agent import answer_question, get_agent
+    from src.serving import FairScheduler, summarize
+
+    get_agent()
+    scheduler = FairScheduler(concurrency=args.concurrency, max_queued_per_user=0)
+    latencies, lock = {}, threading.Lock()
+    threads = [
+        threading.Thread(target=simulate_user, args=(scheduler, answer_question, f"user-{n}", args.questions,
+                                                     args.think_time, latencies, lock))
+        for n in range(args.users)
+    ]
+    if args.batch:
+        threads.append(threading.Thread(target=simulate_batch, args=(scheduler, answer_question, "batch-user",
+                                                                     args.batch, latencies, lock)))
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stats = scheduler.stats()
+    print(f"\n{stats['total']['count']} questions in {elapsed:.1f}s "
+          f"({stats['total']['count'] / elapsed:.2f} questions/s, concurrency {args.concurrency})")
+    print(f"{'':16}{'mean':>8}{'p50':>8}{'p90':>8}{'p99':>8}{'max':>8}")
+    rows = dict(stats)
+    rows["single users"] = summarize(v for user, values in latencies.items() if user != "batch-user" for v in values)
+    if args.batch:
+        rows["batch user"] = summarize(latencies.get("batch-user", []))
+    for name, s in rows.items():
+        print(f"{name.replace('_', ' '):16}" + "".join(f"{s[key]:8.2f}" for key in ("mean", "p50", "p90", "p99", "max")))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(1)
@@ -0,0 +1,14 @@
+"""
+Parsing of the agent's replies.
+
+Kept free of other project imports, so the model, ensemble and app modules can all
+use it without depending on each other.
+"""
+import re
+
+
+def extract_final_answer(answer: str) -> str:
+    """Strips everything but the text after 'FINAL ANSWER:' from the agent's reply."""
+    match = re.search(r"FINAL ANSWER:.*", answer, flags=re.IGNORECASE)
+    answer_line = match.group(0).strip() if match else answer.strip()
+    return re.sub(r"^FINAL ANSWER:", "", answer_line, flags=re.IGNORECASE).strip()
@@ -0,0 +1,75 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class FutureCache:
+    """
+    Thread-safe memo of finished or in-flight computations.
+
+    A value is computed at most once per key: callers that ask for a key which is
+    still being computed (e.g. by a background prefetch) wait for that result
+    instead of starting the work again. Failed computations are not cached.
+
+    Tools whose work src/prefetch.py can predict keep their results in one, so the
+    prefetch and the model's later tool call (or a repeated question) share a single
+    download or parse.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _claim(self, key):
+        """Returns (future, is_new). A new future must be completed by the caller."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self._futures.move_to_end(key)
+                return future, False
+            future = Future()
+            self._futures[key] = future
+            # Evict the oldest finished entries; in-flight work is never dropped
+            for old_key in list(self._futures):
+                if len(self._futures) <= self.max_entries:
+                    break
+                if self._futures[old_key].done():
+                    del self._futures[old_key]
+            return future, True
+
+    def _run(self, key, future: Future, compute):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(compute())
+        except BaseException as e:
+            with self._lock:
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+            future.set_exception(e)
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for key, computing it with compute() if needed."""
+        future, is_new = self._claim(key)
+        if is_new:
+            self._run(key, future, compute)
+        return future.result()
+
+    def prefetch(self, key, compute, executor) -> Future:
+        """Starts computing key on executor unless it is already cached or in flight."""
+        future, is_new = self._claim(key)
+        if is_new:
+            executor.submit(self._run, key, future, compute)
+        return future
+
+    def invalidate(self, key):
+        with self._lock:
+            self._futures.pop(key, None)
+
+
+def file_key(file_path: str):
+    """Cache key for a local file that changes whenever the file is modified."""
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
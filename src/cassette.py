@@ -0,0 +1,360 @@
+"""
+Record/replay of all outbound network traffic.
+
+Set AGENT_NET_MODE=record to capture every LLM call and every tool HTTP request
+(requests, httpx and yt-dlp) into a cassette file, and AGENT_NET_MODE=replay to
+serve them back deterministically without touching the network.
+
+Environment variables:
+    AGENT_NET_MODE         off (default) | record | replay
+    AGENT_CASSETTE         path of the cassette file (default: cassettes/default.json)
+    AGENT_REPLAY_LATENCY   replay only: multiply recorded latencies by this factor
+                           and sleep for them (0 = no simulated latency, 1 = real time)
+"""
+import atexit
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+
+CASSETTE_VERSION = 1
+
+# Fields that must never end up in a request key (or a cassette file).
+_SECRET_FIELDS = {"api_key", "key", "apikey", "access_token", "token"}
+# Headers describing the wire encoding; bodies are stored decoded.
+_STRIPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+_TMP_PATH_RE = re.compile(re.escape(tempfile.gettempdir()) + r"""[\\/][^\s"']+""")
+
+
+class CassetteMissError(RuntimeError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+class Cassette:
+    """A versioned file of recorded request/response interactions."""
+
+    def __init__(self, path: str, mode: str, latency_factor: float = 0.0):
+        self.path = path
+        self.mode = mode
+        self.latency_factor = latency_factor
+        self._lock = threading.Lock()
+        self._interactions = []
+        self._by_key = defaultdict(deque)
+        if mode == "replay":
+            self._load()
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        version = data.get("version")
+        if version != CASSETTE_VERSION:
+            raise ValueError(f"Cassette {self.path} has version {version}, expected {CASSETTE_VERSION}.")
+        for interaction in data.get("interactions", []):
+            self._by_key[(interaction["kind"], interaction["key"])].append(interaction)
+        print(f"Replaying {len(data.get('interactions', []))} recorded interactions from {self.path}")
+
+    def record(self, kind: str, key: str, request: dict, response: dict, latency: float):
+        with self._lock:
+            self._interactions.append({
+                "kind": kind,
+                "key": key,
+                "request": request,
+                "response": response,
+                "latency": round(latency, 4),
+            })
+
+    def replay(self, kind: str, key: str, description: str) -> dict:
+        with self._lock:
+            queue = self._by_key.get((kind, key))
+            if not queue:
+                raise CassetteMissError(f"No recorded {kind} response in {self.path} for {description}")
+            # Identical requests are served in recorded order; the last one keeps repeating.
+            interaction = queue.popleft() if len(queue) > 1 else queue[0]
+        if self.latency_factor > 0:
+            time.sleep(interaction["latency"] * self.latency_factor)
+        return interaction["response"]
+
+    def save(self):
+        if self.mode != "record":
+            return
+        with self._lock:
+            data = {"version": CASSETTE_VERSION, "interactions": list(self._interactions)}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        print(f"Saved {len(data['interactions'])} recorded interactions to {self.path}")
+
+
+_active = None
+
+
+def active_cassette():
+    """Returns the installed cassette, or None when record/replay is off."""
+    return _active
+
+
+# --- helpers ---------------------------------------------------------------
+
+def _encode_body(body) -> dict:
+    if body is None:
+        return {"text": ""}
+    if isinstance(body, str):
+        return {"text": body}
+    try:
+        return {"text": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(body).decode("ascii")}
+
+
+def _decode_body(data: dict) -> bytes:
+    if "base64" in data:
+        return base64.b64decode(data["base64"])
+    return data.get("text", "").encode("utf-8")
+
+
+def _clean_headers(headers) -> dict:
+    return {k: v for k, v in dict(headers).items() if k.lower() not in _STRIPPED_HEADERS}
+
+
+def _strip_secrets_from_url(url: str) -> str:
+    return re.sub(r"([?&])(" + "|".join(_SECRET_FIELDS) + r")=[^&]*", r"\1\2=", str(url))
+
+
+def _body_fingerprint(body) -> str:
+    """Hashes a request body with secrets and temp file paths removed."""
+    if not body:
+        return ""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if not isinstance(body, bytes):
+        return ""  # streamed/multipart bodies are matched on method and URL only
+    try:
+        payload = json.loads(body)
+        if isinstance(payload, dict):
+            payload = {k: v for k, v in payload.items() if k not in _SECRET_FIELDS}
+        body = json.dumps(payload, sort_keys=True).encode("utf-8")
+    except ValueError:
+        pass
+    body = _TMP_PATH_RE.sub("<tmpfile>", body.decode("utf-8", "replace")).encode("utf-8")
+    return hashlib.sha256(body).hexdigest()
+
+
+def _http_key(method: str, url: str, body) -> str:
+    url = _TMP_PATH_RE.sub("<tmpfile>", _strip_secrets_from_url(url))
+    return hashlib.sha256(f"{method.upper()} {url} {_body_fingerprint(body)}".encode("utf-8")).hexdigest()
+
+
+# --- requests --------------------------------------------------------------
+
+def _patch_requests(cassette: Cassette):
+    try:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from requests.structures import CaseInsensitiveDict
+        from requests.utils import get_encoding_from_headers
+    except ImportError:
+        return
+
+    original_send = HTTPAdapter.send
+
+    def send(self, request, **kwargs):
+        url = _strip_secrets_from_url(request.url)
+        key = _http_key(request.method, request.url, request.body)
+        if cassette.mode == "replay":
+            recorded = cassette.replay("http", key, f"{request.method} {url}")
+            response = requests.models.Response()
+            response.status_code = recorded["status"]
+            response.reason = recorded.get("reason", "")
+            response.headers = CaseInsensitiveDict(recorded["headers"])
+            response.encoding = get_encoding_from_headers(response.headers)
+            response._content = _decode_body(recorded["body"])
+            response._content_consumed = True
+            response.raw = io.BytesIO(response._content)
+            response.url = request.url
+            response.request = request
+            response.connection = self
+            return response
+
+        start = time.perf_counter()
+        response = original_send(self, request, **kwargs)
+        content = response.content  # buffers streamed bodies; iter_content() still works afterwards
+        cassette.record(
+            "http", key,
+            {"method": request.method, "url": url},
+            {"status": response.status_code, "reason": response.reason,
+             "headers": _clean_headers(response.headers), "body": _encode_body(content)},
+            time.perf_counter() - start,
+        )
+        return response
+
+    HTTPAdapter.send = send
+
+
+# --- httpx -----------------------------------------------------------------
+
+def _patch_httpx(cassette: Cassette):
+    try:
+        import httpx
+    except ImportError:
+        return
+
+    original_handle = httpx.HTTPTransport.handle_request
+
+    def handle_request(self, request):
+        url = _strip_secrets_from_url(request.url)
+        body = request.read()
+        key = _http_key(request.method, str(request.url), body)
+        if cassette.mode == "replay":
+            recorded = cassette.replay("http", key, f"{request.method} {url}")
+            return httpx.Response(recorded["status"], headers=recorded["headers"],
+                                  content=_decode_body(recorded["body"]), request=request)
+
+        start = time.perf_counter()
+        response = original_handle(self, request)
+        content = response.read()
+        cassette.record(
+            "http", key,
+            {"method": request.method, "url": url},
+            {"status": response.status_code, "headers": _clean_headers(response.headers),
+             "body": _encode_body(content)},
+            time.perf_counter() - start,
+        )
+        # The transport response has been consumed, so hand back a buffered copy
+        return httpx.Response(response.status_code, headers=_clean_headers(response.headers),
+                              content=content, request=request)
+
+    httpx.HTTPTransport.handle_request = handle_request
+
+
+# --- yt-dlp (uses its own networking stack) --------------------------------
+
+def _patch_yt_dlp(cassette: Cassette):
+    try:
+        import yt_dlp
+        from yt_dlp.networking.common import Response
+    except ImportError:
+        return
+
+    original_urlopen = yt_dlp.YoutubeDL.urlopen
+
+    def urlopen(self, req):
+        url = req if isinstance(req, str) else req.url
+        method = "GET" if isinstance(req, str) else (req.method or "GET")
+        data = None if isinstance(req, str) else req.data
+        key = _http_key(method, url, data)
+        if cassette.mode == "replay":
+            recorded = cassette.replay("http", key, f"{method} {_strip_secrets_from_url(url)}")
+            return Response(io.BytesIO(_decode_body(recorded["body"])), url=recorded.get("url", url),
+                            headers=recorded["headers"], status=recorded["status"])
+
+        start = time.perf_counter()
+        response = original_urlopen(self, req)
+        content = response.read()
+        response.close()
+        headers = _clean_headers(response.headers)
+        cassette.record(
+            "http", key,
+            {"method": method, "url": _strip_secrets_from_url(url)},
+            {"status": response.status, "url": response.url, "headers": headers,
+             "body": _encode_body(content)},
+            time.perf_counter() - start,
+        )
+        return Response(io.BytesIO(content), url=response.url, headers=headers, status=response.status)
+
+    yt_dlp.YoutubeDL.urlopen = urlopen
+
+
+# --- LLM calls (Gemini speaks gRPC/REST through its own client) -------------
+
+def _llm_key(model: str, messages, stop, kwargs) -> str:
+    canonical = []
+    for m in messages:
+        entry = {"type": m.type, "content": m.content}
+        if getattr(m, "tool_calls", None):
+            entry["tool_calls"] = [{"name": c["name"], "args": c["args"], "id": c.get("id")} for c in m.tool_calls]
+        if getattr(m, "tool_call_id", None):
+            entry["tool_call_id"] = m.tool_call_id
+        canonical.append(entry)
+    payload = json.dumps({"model": model, "messages": canonical, "stop": stop, "kwargs": kwargs},
+                         sort_keys=True, default=str)
+    payload = _TMP_PATH_RE.sub("<tmpfile>", payload)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _patch_gemini(cassette: Cassette):
+    try:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        from langchain_core.messages import message_to_dict, messages_from_dict
+        from langchain_core.outputs import ChatGeneration, ChatResult
+    except ImportError:
+        return
+
+    def to_result(recorded):
+        messages = messages_from_dict(recorded["messages"])
+        return ChatResult(generations=[ChatGeneration(message=m) for m in messages])
+
+    def to_recording(result):
+        return {"messages": [message_to_dict(g.message) for g in result.generations]}
+
+    original_generate = ChatGoogleGenerativeAI._generate
+    original_agenerate = ChatGoogleGenerativeAI._agenerate
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = _llm_key(self.model, messages, stop, kwargs)
+        if cassette.mode == "replay":
+            return to_result(cassette.replay("llm", key, f"{self.model} call with {len(messages)} messages"))
+        start = time.perf_counter()
+        result = original_generate(self, messages, stop=stop, run_manager=run_manager, **kwargs)
+        cassette.record("llm", key, {"model": self.model}, to_recording(result), time.perf_counter() - start)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = _llm_key(self.model, messages, stop, kwargs)
+        if cassette.mode == "replay":
+            return to_result(cassette.replay("llm", key, f"{self.model} call with {len(messages)} messages"))
+        start = time.perf_counter()
+        result = await original_agenerate(self, messages, stop=stop, run_manager=run_manager, **kwargs)
+        cassette.record("llm", key, {"model": self.model}, to_recording(result), time.perf_counter() - start)
+        return result
+
+    ChatGoogleGenerativeAI._generate = _generate
+    ChatGoogleGenerativeAI._agenerate = _agenerate
+
+
+def install_from_env():
+    """Installs the record/replay hooks selected by AGENT_NET_MODE. Safe to call more than once."""
+    global _active
+    mode = os.getenv("AGENT_NET_MODE", "off").lower()
+    if _active is not None or mode not in ("record", "replay"):
+        return _active
+
+    path = os.getenv("AGENT_CASSETTE", os.path.join("cassettes", "default.json"))
+    latency_factor = float(os.getenv("AGENT_REPLAY_LATENCY", "0") or 0)
+    if mode == "replay":
+        # Clients refuse to start without credentials; nothing is sent in replay mode anyway.
+        os.environ.setdefault("GOOGLE_API_KEY", "replay")
+        os.environ.setdefault("TAVILY_API_KEY", "replay")
+
+    cassette = Cassette(path, mode, latency_factor)
+    _patch_requests(cassette)
+    _patch_httpx(cassette)
+    _patch_yt_dlp(cassette)
+    _patch_gemini(cassette)
+    atexit.register(cassette.save)
+    _active = cassette
+    print(f"Network {mode} mode enabled (cassette: {path})")
+    return cassette
+
+
+def save_cassette():
+    """Flushes recorded interactions to disk (also done automatically at exit)."""
+    if _active is not None:
+        _active.save()
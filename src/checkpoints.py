@@ -0,0 +1,137 @@
+"""
+Durable graph checkpoints.
+
+Graphs are compiled with a SQLite checkpointer, so the state after every assistant and
+tools step is on disk, keyed by a thread id derived from the task id. If the process
+dies or a model call fails mid-question, the next run of the same question resumes
+from the last finished step instead of starting over.
+
+    AGENT_CHECKPOINT_DB           database path (default: checkpoints.sqlite; "off" disables checkpointing)
+    AGENT_CHECKPOINT_KEEP         checkpoints kept per thread; older ones are compacted away (default: 2)
+    AGENT_CHECKPOINT_MAX_AGE_HOURS unfinished threads older than this are dropped at startup (default: 72)
+
+Threads of finished questions are deleted right away, so the store only ever holds
+questions that are running or were interrupted. Their workspaces (src/workspace.py) are
+kept for as long by default; a thread whose workspace is gone anyway starts over.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from functools import partial
+from typing import Optional
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+CHECKPOINT_DB = os.getenv("AGENT_CHECKPOINT_DB", "checkpoints.sqlite")
+CHECKPOINT_KEEP = max(2, int(os.getenv("AGENT_CHECKPOINT_KEEP", "2"))) # the parent is needed to restore pending writes
+CHECKPOINT_MAX_AGE_HOURS = float(os.getenv("AGENT_CHECKPOINT_MAX_AGE_HOURS", "72"))
+
+
+class CompactingSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver that keeps only the newest checkpoints of each thread, tracks when a
+    thread was last written, and offers the async interface (run on a worker thread)
+    so the same checkpointer serves both invoke() and the ensemble's ainvoke().
+    """
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+            )
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = next_config["configurable"]["thread_id"]
+        checkpoint_ns = next_config["configurable"].get("checkpoint_ns", "")
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            # checkpoint ids are time-ordered, so everything below the newest CHECKPOINT_KEEP is history
+            stale = """SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+                       ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?"""
+            params = (thread_id, checkpoint_ns, CHECKPOINT_KEEP)
+            self.conn.execute(
+                f"DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ({stale})",
+                (thread_id, checkpoint_ns) + params,
+            )
+            self.conn.execute(
+                f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ({stale})",
+                (thread_id, checkpoint_ns) + params,
+            )
+        return next_config
+
+    def forget(self, thread_id: str) -> None:
+        """Deletes every checkpoint of a thread."""
+        self.setup()
+        with self.lock, self.conn:
+            for table in ("checkpoints", "writes", "thread_activity"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def prune(self, max_age_hours: float = CHECKPOINT_MAX_AGE_HOURS) -> int:
+        """Deletes threads not written for max_age_hours and reclaims the space; returns how many."""
+        self.setup()
+        cutoff = time.time() - max_age_hours * 3600
+        with self.lock:
+            stale = [row[0] for row in self.conn.execute(
+                "SELECT thread_id FROM thread_activity WHERE updated_at < ?", (cutoff,)
+            )]
+        for thread_id in stale:
+            self.forget(thread_id)
+        if stale:
+            with self.lock:
+                self.conn.execute("VACUUM")
+        return len(stale)
+
+    async def _in_thread(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(None, partial(fn, *args, **kwargs))
+
+    async def aget_tuple(self, config):
+        return await self._in_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in await self._in_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit))):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await self._in_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, *args, **kwargs):
+        return await self._in_thread(self.put_writes, config, writes, task_id, *args, **kwargs)
+
+
+_checkpointer: Optional[CompactingSqliteSaver] = None
+_checkpointer_lock = threading.Lock()
+
+
+def checkpointing_enabled() -> bool:
+    return CHECKPOINT_DB.lower() not in ("", "off", "0", "none")
+
+
+def get_checkpointer() -> Optional[CompactingSqliteSaver]:
+    """Returns the process-wide checkpointer (None when checkpointing is off)."""
+    global _checkpointer
+    if not checkpointing_enabled():
+        return None
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            conn = sqlite3.connect(CHECKPOINT_DB, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            _checkpointer = CompactingSqliteSaver(conn)
+            removed = _checkpointer.prune()
+            if removed:
+                print(f"Dropped {removed} stale checkpoint threads from {CHECKPOINT_DB}")
+        return _checkpointer
+
+
+def forget_thread(thread_id: str) -> None:
+    checkpointer = get_checkpointer()
+    if checkpointer is not None:
+        checkpointer.forget(thread_id)
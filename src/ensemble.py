@@ -0,0 +1,169 @@
+"""
+Parallel self-consistency answering.
+
+With AGENT_ENSEMBLE_SIZE=N (N > 1), each question is answered by N independent
+agent runs launched concurrently. Their FINAL ANSWER strings are normalized and
+counted, and as soon as AGENT_ENSEMBLE_QUORUM runs agree (default: a majority)
+the remaining runs are cancelled. Voting accuracy at about the wall-clock cost of
+a single run.
+"""
+import asyncio
+import os
+import re
+import uuid
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from src.answers import extract_final_answer
+from src.checkpoints import forget_thread
+from src.workspace import current_workspace
+
+ENSEMBLE_SIZE = int(os.getenv("AGENT_ENSEMBLE_SIZE", "1"))
+ENSEMBLE_QUORUM = int(os.getenv("AGENT_ENSEMBLE_QUORUM", "0")) # 0 = simple majority
+ENSEMBLE_TIMEOUT = float(os.getenv("AGENT_ENSEMBLE_TIMEOUT", "600"))
+# Times a run that failed mid-question is resumed from its last checkpoint before giving up
+RESUME_RETRIES = int(os.getenv("AGENT_RESUME_RETRIES", "1"))
+
+
+def _normalize_item(item: str) -> str:
+    item = item.strip().strip("\"'`").strip()
+    item = re.sub(r"\s+", " ", item.lower()).rstrip(".")
+    # Numbers compare by value: "1,000" == "1000", "5.0" == "5", "$12" == "12"
+    number = re.sub(r"[,$%\s]", "", item)
+    if re.fullmatch(r"-?\d+(\.\d+)?", number):
+        value = float(number)
+        return str(int(value)) if value.is_integer() else repr(value)
+    return item
+
+
+def normalize_answer(answer: str) -> str:
+    """Canonical form of a final answer used for voting (case, spacing, number and list formatting)."""
+    answer = extract_final_answer(answer)
+    if "," in answer and not re.fullmatch(r"[\d,.$%\s-]+", answer):
+        return ", ".join(_normalize_item(part) for part in answer.split(","))
+    return _normalize_item(answer)
+
+
+def _quorum(size: int, quorum: Optional[int]) -> int:
+    quorum = quorum or ENSEMBLE_QUORUM or size // 2 + 1
+    return max(1, min(quorum, size))
+
+
+def _thread_config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def _workspace_lost(state, thread_id: str) -> bool:
+    """
+    Whether an interrupted thread's files are gone: its workspace was collected since the
+    checkpoint was written, so tool results in the history point at missing files. Such a
+    thread is forgotten and the question starts over.
+    """
+    workspace = current_workspace()
+    if state is None or not state.next or workspace is None or not workspace.recreated:
+        return False
+    print(f"The workspace of {thread_id} was cleaned up since it was interrupted; starting the question over")
+    forget_thread(thread_id)
+    return True
+
+
+def _invoke_resumable(agent, messages: List, thread_id: str) -> dict:
+    """Runs the graph on a thread, continuing from its last checkpoint if it was interrupted."""
+    config = _thread_config(thread_id)
+    for attempt in range(RESUME_RETRIES + 1):
+        state = agent.get_state(config) if agent.checkpointer else None
+        if attempt == 0 and _workspace_lost(state, thread_id):
+            state = None
+        try:
+            if state is not None and state.next:
+                print(f"Resuming {thread_id} from its last checkpoint ({len(state.values.get('messages', []))} messages)")
+                return agent.invoke(None, config)
+            if state is not None and state.values:
+                return state.values # finished before the process stopped, but was not cleaned up
+            return agent.invoke({"messages": messages}, config)
+        except Exception as e:
+            if attempt == RESUME_RETRIES or not agent.checkpointer:
+                raise
+            print(f"Run {thread_id} failed ({e}); resuming from its last checkpoint")
+
+
+async def _ainvoke_resumable(agent, messages: List, thread_id: str) -> dict:
+    config = _thread_config(thread_id)
+    for attempt in range(RESUME_RETRIES + 1):
+        state = await agent.aget_state(config) if agent.checkpointer else None
+        if attempt == 0 and _workspace_lost(state, thread_id):
+            state = None
+        try:
+            if state is not None and state.next:
+                print(f"Resuming {thread_id} from its last checkpoint ({len(state.values.get('messages', []))} messages)")
+                return await agent.ainvoke(None, config)
+            if state is not None and state.values:
+                return state.values # finished before the process stopped, but was not cleaned up
+            return await agent.ainvoke({"messages": list(messages)}, config)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if attempt == RESUME_RETRIES or not agent.checkpointer:
+                raise
+            print(f"Run {thread_id} failed ({e}); resuming from its last checkpoint")
+
+
+async def _run_ensemble(agent, messages: List, size: int, quorum: int, timeout: float, thread_id: str) -> Tuple[str, str]:
+    tasks = [
+        asyncio.create_task(_ainvoke_resumable(agent, messages, f"{thread_id}/run-{number}"))
+        for number in range(size)
+    ]
+    votes = Counter()
+    first_reply = {} # normalized answer -> full reply of the first run that gave it
+    errors = []
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=timeout):
+            try:
+                result = await next_done
+            except asyncio.TimeoutError:
+                raise
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            reply = result["messages"][-1].content
+            key = normalize_answer(reply)
+            votes[key] += 1
+            first_reply.setdefault(key, reply)
+            if votes[key] >= quorum:
+                break
+    except asyncio.TimeoutError:
+        print(f"Ensemble timed out after {timeout}s with {sum(votes.values())} finished runs.")
+    finally:
+        # Early consensus (or timeout): stop the runs that are still going
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if not votes:
+        raise RuntimeError(f"All {size} ensemble runs failed: {'; '.join(errors) or 'timed out'}")
+    for number in range(size):
+        forget_thread(f"{thread_id}/run-{number}") # answered: the checkpoints are no longer needed
+    best, count = votes.most_common(1)[0]
+    finished = sum(votes.values())
+    print(f"Ensemble: {count}/{finished} finished runs agree on '{best}' ({size - finished - len(errors)} cancelled)")
+    return first_reply[best], f"{count}/{finished}"
+
+
+def run_agent(agent, messages: List, size: Optional[int] = None, quorum: Optional[int] = None,
+              thread_id: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Runs the agent on a message list and returns (reply content, votes).
+
+    With an ensemble size above 1 the runs happen concurrently and votes reads like
+    "3/4" (agreeing/finished runs); otherwise a single run is made and votes is "1/1".
+    thread_id keys the checkpoints of the run: a question interrupted earlier resumes
+    where it stopped when it is asked again with the same thread_id.
+    """
+    size = size or ENSEMBLE_SIZE
+    thread_id = thread_id or uuid.uuid4().hex
+    if size <= 1:
+        response = _invoke_resumable(agent, messages, thread_id)
+        forget_thread(thread_id) # answered: the checkpoints are no longer needed
+        return response["messages"][-1].content, "1/1"
+    return asyncio.run(_run_ensemble(agent, messages, size, _quorum(size, quorum), ENSEMBLE_TIMEOUT, thread_id))
@@ -0,0 +1,128 @@
+"""
+Attachment type sniffing from magic bytes.
+
+Attachments often arrive without a (trustworthy) extension, so the file type is
+detected from its first bytes instead, falling back to the extension.
+"""
+import json
+import os
+import zipfile
+from typing import Tuple
+
+# (magic prefix, offset, extension, MIME type)
+_SIGNATURES = [
+    (b"%PDF", 0, ".pdf", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", 0, ".png", "image/png"),
+    (b"\xff\xd8\xff", 0, ".jpg", "image/jpeg"),
+    (b"GIF87a", 0, ".gif", "image/gif"),
+    (b"GIF89a", 0, ".gif", "image/gif"),
+    (b"BM", 0, ".bmp", "image/bmp"),
+    (b"ID3", 0, ".mp3", "audio/mpeg"),
+    (b"\xff\xfb", 0, ".mp3", "audio/mpeg"),
+    (b"\xff\xf3", 0, ".mp3", "audio/mpeg"),
+    (b"\xff\xf2", 0, ".mp3", "audio/mpeg"),
+    (b"OggS", 0, ".ogg", "audio/ogg"),
+    (b"fLaC", 0, ".flac", "audio/flac"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", 0, ".xls", "application/vnd.ms-excel"),
+]
+_RIFF_TYPES = {
+    b"WAVE": (".wav", "audio/wav"),
+    b"WEBP": (".webp", "image/webp"),
+    b"AVI ": (".avi", "video/x-msvideo"),
+}
+# Office Open XML packages are zip files told apart by their top-level folder
+_OOXML_FOLDERS = {
+    "xl/": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "word/": (".docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "ppt/": (".pptx", "application/vnd.openxmlformats-officedocument.presentationml.presentation"),
+}
+_EXTENSION_MIME = {
+    ".csv": "text/csv",
+    ".json": "application/json",
+    ".py": "text/x-python",
+    ".txt": "text/plain",
+    ".md": "text/markdown",
+}
+
+SNIFF_BYTES = 8192
+
+
+def _sniff_zip(file_path: str) -> Tuple[str, str]:
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            names = archive.namelist()
+    except zipfile.BadZipFile:
+        return ".zip", "application/zip"
+    for folder, file_type in _OOXML_FOLDERS.items():
+        if any(name.startswith(folder) for name in names):
+            return file_type
+    return ".zip", "application/zip"
+
+
+def _sniff_text(head: bytes) -> Tuple[str, str]:
+    try:
+        text = head.decode("utf-8")
+    except UnicodeDecodeError:
+        # The sniffed prefix may end mid-character; retry without the last few bytes
+        try:
+            text = head[:-4].decode("utf-8")
+        except UnicodeDecodeError:
+            return "", "application/octet-stream"
+    stripped = text.lstrip()
+    if stripped[:1] in ("{", "["):
+        try:
+            json.loads(text)
+            return ".json", "application/json"
+        except ValueError:
+            pass
+    lines = [line for line in text.splitlines() if line.strip()][:20]
+    if any(line.startswith(("import ", "from ", "def ", "class ", "print(")) for line in lines):
+        return ".py", "text/x-python"
+    if len(lines) >= 2:
+        comma_counts = {line.count(",") for line in lines[:-1]} # the last line may be truncated
+        if len(comma_counts) == 1 and comma_counts.pop() > 0:
+            return ".csv", "text/csv"
+    return ".txt", "text/plain"
+
+
+def sniff_file_type(file_path: str) -> Tuple[str, str]:
+    """
+    Returns (extension, MIME type) for a file, detected from its content.
+
+    The extension includes the leading dot. Unknown binary files fall back to
+    their own extension, or ("", "application/octet-stream").
+    """
+    with open(file_path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+
+    for magic, offset, extension, mime_type in _SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return extension, mime_type
+    if head[:4] == b"RIFF" and head[8:12] in _RIFF_TYPES:
+        return _RIFF_TYPES[head[8:12]]
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand.startswith(b"M4A"):
+            return ".m4a", "audio/mp4"
+        return ".mp4", "video/mp4"
+    if head[:4] == b"PK\x03\x04":
+        return _sniff_zip(file_path)
+
+    own_extension = os.path.splitext(file_path)[1].lower()
+    if own_extension in _EXTENSION_MIME:
+        return own_extension, _EXTENSION_MIME[own_extension]
+    if b"\x00" not in head:
+        return _sniff_text(head)
+    return own_extension, "application/octet-stream"
+
+
+def ensure_extension(file_path: str) -> str:
+    """Renames an extension-less file to carry its sniffed extension and returns the new path."""
+    if os.path.splitext(file_path)[1]:
+        return file_path
+    extension, _ = sniff_file_type(file_path)
+    if not extension:
+        return file_path
+    new_path = file_path + extension
+    os.replace(file_path, new_path)
+    return new_path
@@ -0,0 +1,234 @@
+"""
+Incremental HTML-to-text extraction.
+
+HTMLTextExtractor turns HTML into a flat list of blocks (headings, paragraphs and
+tables) without building a DOM. It can be fed a page chunk by chunk, so callers can
+stop reading once they have collected enough text.
+"""
+import re
+from html.parser import HTMLParser
+from typing import Iterable, List
+
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dt", "dd",
+    "blockquote", "pre", "figcaption", "figure", "body",
+}
+# Elements whose content is never useful as text
+SKIP_TAGS = {
+    "script", "style", "noscript", "svg", "button", "form", "nav", "footer", "header",
+    "aside", "template", "iframe", "select", "head",
+}
+# Inside these, a <header> holds the article's title rather than page furniture
+CONTENT_TAGS = {"article", "main"}
+# Elements whose end tag may be omitted: tag -> (start tags of siblings that end it,
+# end tags of parents that end it). The end tag of a skipped one may never come.
+_TABLE_SECTIONS = {"tbody", "thead", "tfoot"}
+OPTIONAL_END_TAGS = {
+    "li": ({"li"}, {"ul", "ol", "menu"}),
+    "dt": ({"dt", "dd"}, {"dl"}),
+    "dd": ({"dt", "dd"}, {"dl"}),
+    "td": ({"td", "th", "tr"} | _TABLE_SECTIONS, {"tr", "table"} | _TABLE_SECTIONS),
+    "th": ({"td", "th", "tr"} | _TABLE_SECTIONS, {"tr", "table"} | _TABLE_SECTIONS),
+    "tr": ({"tr"} | _TABLE_SECTIONS, {"table"} | _TABLE_SECTIONS),
+    "option": ({"option", "optgroup"}, {"select", "optgroup", "datalist"}),
+    "p": (
+        BLOCK_TAGS | HEADING_TAGS | {"table", "hr", "form", "nav", "header", "footer", "aside"},
+        BLOCK_TAGS | CONTENT_TAGS | {"td", "th", "nav", "header", "footer", "aside"},
+    ),
+}
+# Elements that open a new scope: a sibling-looking start tag inside them (a nested
+# list, say) doesn't end the skipped element around them
+SCOPE_TAGS = {"ul", "ol", "menu", "dl", "table", "select", "datalist"}
+VOID_TAGS = {
+    "br", "hr", "img", "meta", "link", "input", "wbr", "area", "base", "col", "embed",
+    "source", "track", "param",
+}
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def clean_text(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class HTMLTextExtractor(HTMLParser):
+    """
+    Collects ("heading", level, text), ("paragraph", text) and ("table", rows, classes)
+    blocks in document order. Elements matching skip_classes/skip_ids are dropped.
+    """
+
+    def __init__(self, skip_classes: Iterable[str] = (), skip_ids: Iterable[str] = ()):
+        super().__init__(convert_charrefs=True)
+        self.skip_classes = set(skip_classes)
+        self.skip_ids = set(skip_ids)
+        self.blocks = []
+        self.text_length = 0
+        self._text = []
+        self._heading = None
+        self._skip_tag = None
+        self._skip_open = [] # elements opened (and not yet closed) inside the skipped one
+        self._content_depth = 0
+        self._table_depth = 0
+        self._table = None
+        self._row = None
+        self._cell = None
+
+    # --- helpers ---
+
+    def _flush(self):
+        text = clean_text("".join(self._text))
+        self._text = []
+        if not text:
+            return
+        if self._heading is not None:
+            self.blocks.append(("heading", self._heading, text))
+        else:
+            self.blocks.append(("paragraph", text))
+        self.text_length += len(text)
+
+    def _end_cell(self):
+        if self._cell is not None and self._row is not None:
+            self._row.append(clean_text("".join(self._cell)))
+        self._cell = None
+
+    def _end_row(self):
+        self._end_cell()
+        if self._row:
+            self._table["rows"].append(self._row)
+            self.text_length += sum(len(c) for c in self._row)
+        self._row = None
+
+    def _skip_ended_by_start(self, tag) -> bool:
+        """Whether tag opens a sibling that implicitly closes the skipped element."""
+        closers = OPTIONAL_END_TAGS.get(self._skip_tag)
+        return closers is not None and tag in closers[0] and not SCOPE_TAGS.intersection(self._skip_open)
+
+    def _end_skip(self):
+        self._skip_tag = None
+        self._skip_open = []
+
+    # --- HTMLParser callbacks ---
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_tag is not None:
+            if not self._skip_ended_by_start(tag):
+                if tag not in VOID_TAGS:
+                    self._skip_open.append(tag)
+                return
+            self._end_skip()
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        if tag in VOID_TAGS:
+            if tag == "br":
+                (self._cell if self._cell is not None else self._text).append(" ")
+            return
+        skip_tag = tag in SKIP_TAGS and not (tag == "header" and self._content_depth)
+        if skip_tag or self.skip_classes.intersection(classes) or attrs.get("id") in self.skip_ids:
+            self._skip_tag = tag
+            return
+        if tag in CONTENT_TAGS:
+            self._content_depth += 1
+
+        if tag == "table":
+            self._table_depth += 1
+            if self._table_depth == 1:
+                self._flush()
+                self._table = {"rows": [], "classes": classes}
+            elif self._cell is not None:
+                self._cell.append(" ")
+            return
+        if self._table is not None:
+            # Nested tables and inline markup just add their text to the current cell
+            if self._table_depth == 1:
+                if tag == "tr":
+                    self._end_row()
+                    self._row = []
+                elif tag in ("td", "th"):
+                    self._end_cell()
+                    if self._row is None:
+                        self._row = []
+                    self._cell = []
+            if self._cell is not None and (tag in BLOCK_TAGS or tag in ("tr", "td", "th")):
+                self._cell.append(" ")
+            return
+
+        if tag in HEADING_TAGS:
+            self._flush()
+            self._heading = int(tag[1])
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if self._skip_tag is not None:
+            if tag in self._skip_open:
+                # Close it along with anything left open inside it
+                del self._skip_open[len(self._skip_open) - 1 - self._skip_open[::-1].index(tag):]
+                return
+            if tag == self._skip_tag:
+                self._end_skip()
+                return
+            closers = OPTIONAL_END_TAGS.get(self._skip_tag)
+            if closers is None or tag not in closers[1]:
+                return # stray end tag
+            self._end_skip() # the parent closes; handle its end tag below
+        if tag in CONTENT_TAGS and self._content_depth:
+            self._content_depth -= 1
+
+        if tag == "table" and self._table_depth:
+            self._table_depth -= 1
+            if self._table_depth == 0:
+                self._end_row()
+                if self._table["rows"]:
+                    self.blocks.append(("table", self._table["rows"], self._table["classes"]))
+                self._table = None
+            return
+        if self._table is not None:
+            if self._table_depth == 1:
+                if tag in ("td", "th"):
+                    self._end_cell()
+                elif tag == "tr":
+                    self._end_row()
+            return
+
+        if tag in HEADING_TAGS and self._heading is not None:
+            self._flush()
+            self._heading = None
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._skip_tag is not None:
+            return
+        if self._table is not None:
+            if self._cell is not None:
+                self._cell.append(data)
+            return
+        self._text.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def render_table(rows: List[List[str]]) -> str:
+    return "\n".join(" | ".join(cell for cell in row) for row in rows if any(row))
+
+
+def render_blocks(blocks) -> str:
+    """Renders extracted blocks as compact text (markdown-style headings, pipe-separated tables)."""
+    parts = []
+    for block in blocks:
+        if block[0] == "heading":
+            parts.append("#" * block[1] + " " + block[2])
+        elif block[0] == "paragraph":
+            parts.append(block[1])
+        else:
+            parts.append(render_table(block[1]))
+    return "\n\n".join(parts)
+
+
+def html_to_text(html: str, **kwargs) -> str:
+    extractor = HTMLTextExtractor(**kwargs)
+    extractor.feed(html)
+    extractor.close()
+    return render_blocks(extractor.blocks)
@@ -0,0 +1,153 @@
+"""
+Central model configuration with latency-aware tiers.
+
+Every LLM in the project is obtained through get_llm(tier_for(component)), so model
+choice lives in one place and can be overridden with environment variables:
+
+    AGENT_MODEL_FAST / AGENT_MODEL_STANDARD / AGENT_MODEL_STRONG   model name per tier
+    AGENT_TIER_<COMPONENT>                                         tier per component
+
+The assistant node runs on the fast tier and escalates a turn to the strong tier only
+when its final answer fails the system prompt's format check or looks unconfident.
+Latency of every call is recorded per tier.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from src.answers import extract_final_answer
+
+MODEL_TIERS = {
+    "fast": os.getenv("AGENT_MODEL_FAST", "gemini-2.0-flash-lite"),
+    "standard": os.getenv("AGENT_MODEL_STANDARD", "gemini-2.0-flash"),
+    "strong": os.getenv("AGENT_MODEL_STRONG", "gemini-2.5-flash"),
+}
+
+# Default tier of each component that calls an LLM
+_DEFAULT_COMPONENT_TIERS = {
+    "assistant": "fast",        # routing, tool selection and simple answers
+    "escalation": "strong",     # re-answers turns that fail the answer checks
+    "analyze_image": "standard",
+    "analyze_audio": "standard",
+    "analyze_youtube": "fast",  # extraction from a transcript already in the prompt
+    "chess_transcription": "strong", # one wrong square changes the answer
+}
+
+# Phrases that mark an answer the model itself isn't sure about
+_UNCONFIDENT_PHRASES = (
+    "i cannot", "i can't", "unable to", "i don't know", "i do not know", "not sure",
+    "cannot be determined", "no information", "not available", "[your final answer]",
+)
+MAX_ANSWER_WORDS = 30
+
+
+def tier_for(component: str) -> str:
+    return os.getenv(f"AGENT_TIER_{component.upper()}", _DEFAULT_COMPONENT_TIERS.get(component, "standard"))
+
+
+# --- latency metrics -------------------------------------------------------
+
+_latencies = {}
+_latencies_lock = threading.Lock()
+
+
+class LatencyRecorder(BaseCallbackHandler):
+    """Records the wall-clock duration of every call made by a model of a given tier."""
+
+    def __init__(self, tier: str):
+        self.tier = tier
+        self._starts = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._record(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._record(run_id)
+
+    def _record(self, run_id):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            with _latencies_lock:
+                _latencies.setdefault(self.tier, []).append(time.perf_counter() - start)
+
+
+def latency_summary() -> dict:
+    """Returns {tier: {"model", "calls", "mean", "p50", "p90", "total"}} in seconds."""
+    summary = {}
+    with _latencies_lock:
+        items = {tier: sorted(values) for tier, values in _latencies.items()}
+    for tier, values in items.items():
+        summary[tier] = {
+            "model": MODEL_TIERS.get(tier, tier),
+            "calls": len(values),
+            "mean": sum(values) / len(values),
+            "p50": values[len(values) // 2],
+            "p90": values[min(len(values) - 1, int(len(values) * 0.9))],
+            "total": sum(values),
+        }
+    return summary
+
+
+def latency_summary_text() -> str:
+    return "; ".join(
+        f"{tier} ({s['model']}): {s['calls']} calls, mean {s['mean']:.2f}s, p90 {s['p90']:.2f}s"
+        for tier, s in latency_summary().items()
+    ) or "no LLM calls recorded"
+
+
+# --- model instances -------------------------------------------------------
+
+_llms = {}
+_llms_lock = threading.Lock()
+
+
+def get_llm(tier: str, **kwargs) -> ChatGoogleGenerativeAI:
+    """Returns the shared chat model of a tier (one instance per tier and settings)."""
+    key = (tier, tuple(sorted(kwargs.items())))
+    with _llms_lock:
+        if key not in _llms:
+            _llms[key] = ChatGoogleGenerativeAI(
+                model=MODEL_TIERS.get(tier, tier),
+                callbacks=[LatencyRecorder(tier)],
+                **kwargs,
+            )
+        return _llms[key]
+
+
+def _message_text(message) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+def escalation_reason(message) -> Optional[str]:
+    """
+    Returns why a model reply should be redone by a stronger model, or None if it's fine.
+
+    Tool calls are never escalated; only final answers are checked against the
+    system prompt's "FINAL ANSWER: ..." template and for signs of low confidence.
+    """
+    if getattr(message, "tool_calls", None):
+        return None
+    text = _message_text(message).strip()
+    if "FINAL ANSWER:" not in text.upper():
+        return "missing 'FINAL ANSWER:'"
+    answer = extract_final_answer(text)
+    if not answer:
+        return "empty final answer"
+    if any(phrase in answer.lower() for phrase in _UNCONFIDENT_PHRASES):
+        return "unconfident final answer"
+    if len(answer.split()) > MAX_ANSWER_WORDS:
+        return "final answer too long"
+    return None
@@ -0,0 +1,77 @@
+"""
+Speculative prefetch of question resources.
+
+Before the graph runs, the question text and attachment are scanned for resources
+whose tool call is predictable (YouTube links, direct file links, web pages,
+spreadsheet attachments). Fetching/parsing starts right away in the background,
+in parallel with the first LLM turn, and the results land in the tools' caches so
+the tool call the model eventually makes returns almost immediately.
+"""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from urllib.parse import urlparse
+
+from src.filetypes import sniff_file_type
+from tools.analyze_csv import prefetch_csv
+from tools.analyze_excel import prefetch_excel
+from tools.analyze_youtube import prefetch_video_data
+from tools.download_file import prefetch_download
+from tools.fetch_url import prefetch_page
+
+URL_RE = re.compile(r"https?://[^\s<>\"')\]]+")
+YOUTUBE_HOSTS = ("youtube.com", "www.youtube.com", "m.youtube.com", "youtu.be")
+# Links with these extensions point straight at a file the model will want to download
+DOWNLOADABLE_EXTENSIONS = {
+    ".csv", ".xlsx", ".xls", ".pdf", ".txt", ".json", ".py", ".mp3", ".wav",
+    ".png", ".jpg", ".jpeg", ".gif", ".zip", ".docx", ".pptx",
+}
+EXCEL_EXTENSIONS = {".xlsx", ".xls"}
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+
+def find_urls(text: str) -> List[str]:
+    # Drop trailing punctuation that belongs to the sentence, not the URL
+    return [url.rstrip(".,;:!?") for url in URL_RE.findall(text or "")]
+
+
+def is_youtube_url(url: str) -> bool:
+    return (urlparse(url).hostname or "") in YOUTUBE_HOSTS
+
+
+def prefetch_question(question: str, file_path: Optional[str] = None) -> List[str]:
+    """
+    Starts background fetches for the resources referenced by a question.
+
+    Returns a short description of every prefetch that was started. Failures are
+    never raised here; the tool that later uses the resource reports them.
+    """
+    started = []
+    try:
+        for url in find_urls(question):
+            if is_youtube_url(url):
+                prefetch_video_data(url, _executor)
+                started.append(f"youtube:{url}")
+            elif os.path.splitext(urlparse(url).path)[1].lower() in DOWNLOADABLE_EXTENSIONS:
+                prefetch_download(url, _executor)
+                started.append(f"download:{url}")
+            else:
+                prefetch_page(url, _executor)
+                started.append(f"page:{url}")
+
+        if file_path and os.path.exists(file_path):
+            extension = sniff_file_type(file_path)[0]
+            if extension in EXCEL_EXTENSIONS:
+                prefetch_excel(file_path, _executor)
+                started.append(f"excel:{file_path}")
+            elif extension == ".csv":
+                prefetch_csv(file_path, _executor)
+                started.append(f"csv:{file_path}")
+    except Exception as e:
+        print(f"Warning: prefetch failed for question: {e}")
+
+    if started:
+        print(f"Prefetching: {', '.join(started)}")
+    return started
@@ -0,0 +1,358 @@
+"""
+Opt-in per-question profiling.
+
+Enable with AGENT_PROFILE=sample|deterministic (or the --profile flag of agent.py /
+app.py). Each question is then wrapped in profile_question(), which writes to
+AGENT_PROFILE_DIR (default: profiles/):
+
+    <label>.collapsed   sample mode: folded stacks for flamegraph.pl / speedscope
+    <label>.prof        deterministic mode: cProfile stats (snakeviz, flameprof, pstats)
+    <label>.txt         ranked hot-function report plus tracemalloc peak and top allocation sites
+
+Memory tracing slows allocation-heavy code down a lot; AGENT_PROFILE_MEMORY=0 turns it off.
+
+Only the threads working on the question are profiled: the one that runs it and the
+worker threads its tools run in (tools are wrapped with profiled_tool()), so questions
+served at the same time never show up in each other's reports. The sampling profiler
+looks at those threads every AGENT_PROFILE_INTERVAL seconds and weights each sample by
+the CPU time the thread used since the last one, so threads waiting on the network, a
+lock or sleep() (in Python or in C) don't count; AGENT_PROFILE_IDLE=1 weights by wall
+time instead. Python 3.12+ allows only one cProfile at a time, so in deterministic mode a
+thread whose profiler can't be started (another one is active) is sampled instead. Memory is traced process-wide, so it is only reported for one question at
+a time.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import re
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+_settings = {
+    "mode": os.getenv("AGENT_PROFILE", "").lower(),
+    "output_dir": os.getenv("AGENT_PROFILE_DIR", "profiles"),
+    "interval": float(os.getenv("AGENT_PROFILE_INTERVAL", "0.005")),
+    "include_idle": os.getenv("AGENT_PROFILE_IDLE", "") == "1",
+    "memory": os.getenv("AGENT_PROFILE_MEMORY", "1") != "0",
+}
+PROFILE_MODES = ("sample", "deterministic")
+MAX_STACK_DEPTH = 128
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 15
+
+# Leaf functions (in the standard library) where a thread sits when it is waiting, not computing
+_IDLE_FUNCTIONS = {
+    "wait", "select", "poll", "epoll", "recv", "recv_into", "readinto", "read", "readline",
+    "accept", "sleep", "get", "acquire", "_wait_for_tstate_lock", "join", "result",
+    "communicate", "_communicate", "_worker", "_run_once", "run_forever", "_recv_bytes", "do_handshake",
+}
+_STDLIB_DIR = os.path.normcase(sysconfig.get_paths()["stdlib"])
+# tracemalloc is process-wide, so only one question at a time has its memory traced
+_memory_lock = threading.Lock()
+
+
+def configure(mode: str = None, output_dir: str = None):
+    """Overrides the environment settings (used by the --profile command-line flags)."""
+    if mode is not None:
+        _settings["mode"] = mode.lower()
+    if output_dir is not None:
+        _settings["output_dir"] = output_dir
+
+
+def profiling_enabled() -> bool:
+    return _settings["mode"] in PROFILE_MODES
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    for marker in ("site-packages" + os.sep, "dist-packages" + os.sep):
+        if marker in filename:
+            filename = filename.split(marker, 1)[1]
+            break
+    else:
+        filename = os.path.relpath(filename) if not filename.startswith("<") else filename
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return code.co_name in _IDLE_FUNCTIONS and os.path.normcase(code.co_filename).startswith(_STDLIB_DIR)
+
+
+def _thread_cpu_time(native_id: int) -> Optional[float]:
+    """CPU seconds a thread of this process has used, or None where that can't be read."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        # Linux encodes a thread's CPU clock in the clock id (like glibc's pthread_getcpuclockid)
+        return time.clock_gettime((~native_id << 3) | 6)
+    except OSError: # the thread has exited
+        return None
+
+
+class _Session:
+    """The threads (and, in deterministic mode, finished cProfile runs) of one profiled question."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.threads = Counter() # thread ident -> open profile_thread() blocks
+        self.profilers = []
+        self.unprofiled = 0 # threads that got no cProfile because another profiler was active
+        self.sampler = None
+        self.closed = False
+        # native thread id -> its CPU time when it joined the question or was last sampled
+        self.cpu_seen = {}
+
+    def thread_idents(self):
+        with self.lock:
+            return list(self.threads)
+
+    def start_sampler(self):
+        """Starts sampling the question's threads, unless that already happened or the question is over."""
+        with self.lock:
+            if self.sampler is None and not self.closed:
+                self.sampler = _Sampler(self, _settings["interval"], _settings["include_idle"])
+                self.sampler.start()
+
+    def stop_sampler(self) -> Optional["_Sampler"]:
+        with self.lock:
+            self.closed = True
+            sampler = self.sampler
+        if sampler:
+            sampler.stop()
+        return sampler
+
+
+_current_session: ContextVar[Optional[_Session]] = ContextVar("profile_session", default=None)
+
+
+class _Sampler(threading.Thread):
+    """Periodically records the Python stacks of a question's threads, weighted in microseconds."""
+
+    def __init__(self, session: _Session, interval: float, include_idle: bool):
+        super().__init__(daemon=True, name="profiler-sampler")
+        self.session = session
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._labels = {}
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code)
+        return label
+
+    def _weight(self, thread, frame, elapsed: float) -> int:
+        """Microseconds a sample stands for: the thread's CPU time since the previous round."""
+        if self.include_idle:
+            return round(elapsed * 1e6)
+        cpu = _thread_cpu_time(thread.native_id) if thread is not None else None
+        if cpu is None: # no per-thread CPU clock: fall back to recognising Python-level waits
+            return 0 if _is_idle(frame) else round(elapsed * 1e6)
+        previous = self.session.cpu_seen.get(thread.native_id)
+        self.session.cpu_seen[thread.native_id] = cpu
+        return round((cpu - previous) * 1e6) if previous is not None else 0
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            threads = {t.ident: t for t in threading.enumerate()}
+            frames = sys._current_frames()
+            for ident in self.session.thread_idents():
+                frame, thread = frames.get(ident), threads.get(ident)
+                if frame is None:
+                    continue
+                weight = self._weight(thread, frame, elapsed)
+                if weight <= 0:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(thread.name if thread is not None else f"thread-{ident}")
+                self.stacks[";".join(reversed(stack))] += weight
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _hot_functions_from_stacks(stacks: Counter):
+    """Returns [(function, self weight, total weight)] ranked by self weight."""
+    self_counts, total_counts = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")[1:] # the first entry is the thread name
+        if not frames:
+            continue
+        self_counts[frames[-1]] += count
+        for function in set(frames):
+            total_counts[function] += count
+    return [(f, self_counts[f], total_counts[f]) for f in sorted(total_counts, key=lambda f: (-self_counts[f], -total_counts[f]))]
+
+
+def _allocation_report() -> str:
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+    lines = []
+    for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1024:10.1f} KiB  {stat.count:8d} blocks  {frame.filename}:{frame.lineno}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def profile_thread():
+    """
+    Adds the calling thread to the profile of the question running in this context for
+    the enclosed block (a no-op when none is being profiled or the thread already is).
+    """
+    session = _current_session.get()
+    ident = threading.get_ident()
+    if session is None:
+        yield
+        return
+    with session.lock:
+        nested = ident in session.threads
+        session.threads[ident] += 1
+        if not nested: # CPU the thread used before (maybe for another question) isn't counted
+            session.cpu_seen[threading.get_native_id()] = _thread_cpu_time(threading.get_native_id())
+    profiler = None
+    if session.mode == "deterministic" and not nested:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError: # "Another profiling tool is already active" (Python 3.12+)
+            profiler = None
+            with session.lock:
+                session.unprofiled += 1
+            session.start_sampler()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        with session.lock:
+            session.threads[ident] -= 1
+            if not session.threads[ident]:
+                del session.threads[ident]
+            if profiler:
+                session.profilers.append(profiler)
+
+
+def profiled_tool(tool):
+    """Wraps a tool's function so the worker thread it runs in is part of the question's profile."""
+    func = tool.func
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        with profile_thread():
+            return func(*args, **kwargs)
+
+    tool.func = run
+    return tool
+
+
+@contextmanager
+def profile_question(label: str):
+    """Profiles the enclosed block if profiling is enabled; otherwise does nothing."""
+    mode = _settings["mode"]
+    if mode not in PROFILE_MODES:
+        yield
+        return
+
+    output_dir = _settings["output_dir"]
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", label)[:100] or "question")
+
+    trace_memory = _settings["memory"] and _memory_lock.acquire(blocking=False)
+    if _settings["memory"] and not trace_memory:
+        print(f"Not tracing memory for {label}: another question's memory is being traced")
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(16)
+    if trace_memory:
+        tracemalloc.reset_peak()
+    session = _Session(mode)
+    token = _current_session.set(session)
+    if mode == "sample":
+        session.start_sampler()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        with profile_thread():
+            yield
+    finally:
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        _current_session.reset(token)
+        sampler = session.stop_sampler()
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            allocations = _allocation_report()
+            if started_tracing:
+                tracemalloc.stop()
+            _memory_lock.release()
+
+        report = [
+            f"Question: {label}",
+            f"Mode: {mode}",
+            f"Wall time: {wall:.3f}s, process CPU time (all questions): {cpu:.3f}s",
+        ]
+        if trace_memory:
+            report.append(f"Peak traced memory: {peak / (1024 * 1024):.2f} MiB")
+        elif _settings["memory"]:
+            report.append("Memory not traced: another question's memory was being traced at the same time")
+        if session.unprofiled:
+            report.append(f"cProfile could not be started in {session.unprofiled} thread runs (another profiler was "
+                          "active), so the question's threads were sampled as well")
+        report.append("")
+        if sampler:
+            with open(base + ".collapsed", "w", encoding="utf-8") as f:
+                for stack, weight in sampler.stacks.most_common():
+                    f.write(f"{stack} {weight}\n")
+            busy = sum(sampler.stacks.values())
+            kind = "wall" if sampler.include_idle else "CPU"
+            report.append(f"Hot functions ({sampler.samples} sampling rounds every {sampler.interval * 1000:.1f} ms, "
+                          f"{busy / 1000:.1f} ms {kind} time in the question's threads):")
+            report.append(f"{'self %':>8} {'total %':>8}  function")
+            for function, self_weight, total_weight in _hot_functions_from_stacks(sampler.stacks)[:TOP_FUNCTIONS]:
+                report.append(f"{100 * self_weight / max(busy, 1):8.1f} {100 * total_weight / max(busy, 1):8.1f}  {function}")
+        if session.profilers:
+            stats = pstats.Stats(*session.profilers)
+            stats.dump_stats(base + ".prof")
+            stream = io.StringIO()
+            stats.stream = stream
+            stats.sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+            report.append(f"{len(session.profilers)} thread runs (the question's and its tool calls'):")
+            report.append(stream.getvalue())
+        if trace_memory:
+            report += ["", f"Top allocation sites still alive at the end (of {TOP_ALLOCATIONS}):", allocations]
+
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write("\n".join(report) + "\n")
+        print(f"Profile for {label} written to {base}.*")
+
+
+def add_profile_arguments(parser):
+    """Adds --profile/--profile-dir to an argparse parser."""
+    parser.add_argument("--profile", nargs="?", const="sample", choices=PROFILE_MODES,
+                        help="profile every question (default mode: sample)")
+    parser.add_argument("--profile-dir", default=None, help="where to write profiles (default: profiles/)")
@@ -0,0 +1,96 @@
+"""
+Deterministic question router.
+
+Classifies a question from its URLs, attachment type and keywords and returns the
+names of the tools worth binding for it, so the model gets a smaller tool-schema
+payload and fewer chances to wander off to the wrong tool. Returns None (meaning
+"bind every tool") whenever there is no strong signal.
+"""
+import mimetypes
+import os
+from typing import List, Optional
+from urllib.parse import urlparse
+
+from src.filetypes import sniff_file_type
+from src.prefetch import find_urls, is_youtube_url
+
+CALCULATOR_TOOLS = ["add", "subtract", "multiply", "divide"]
+SEARCH_TOOLS = ["web_search", "wiki_search"]
+ARXIV_TOOLS = ["arxiv_search", "arxiv_fetch_paper"]
+
+# Attachment/link extension -> tool that can read it
+EXTENSION_TOOLS = {
+    ".xlsx": "analyze_excel",
+    ".xls": "analyze_excel",
+    ".csv": "analyze_csv",
+    ".pdf": "analyze_pdf",
+    ".py": "run_python",
+}
+# MIME major type -> tool, used when the extension isn't listed above
+MIME_TOOLS = {
+    "image": "analyze_image",
+    "audio": "analyze_audio",
+}
+
+
+def tool_for_file(path: str) -> Optional[str]:
+    """Returns the name of the analyzer tool for a file path or URL path, if known."""
+    if os.path.isfile(path):
+        # Local files are classified by content; the extension may be missing or wrong
+        extension, mime_type = sniff_file_type(path)
+    else:
+        extension = os.path.splitext(path)[1].lower()
+        mime_type, _ = mimetypes.guess_type(path)
+    if extension in EXTENSION_TOOLS:
+        return EXTENSION_TOOLS[extension]
+    if mime_type:
+        return MIME_TOOLS.get(mime_type.split("/")[0])
+    return None
+
+
+def route_question(question: str, file_path: Optional[str] = None) -> Optional[List[str]]:
+    """
+    Returns the tool names to bind for a question, or None to bind the full tool set.
+    """
+    selected = []
+    confident = False
+
+    if file_path:
+        analyzer = tool_for_file(file_path)
+        if analyzer is None:
+            return None # unknown attachment type, let the model pick from everything
+        selected.extend([analyzer, "analyze_file"])
+        confident = True
+
+    for url in find_urls(question):
+        if (urlparse(url).hostname or "").endswith("arxiv.org"):
+            selected.extend(ARXIV_TOOLS)
+            confident = True
+            continue
+        if is_youtube_url(url):
+            selected.append("answer_question_about_youtube_video")
+            confident = True
+            continue
+        analyzer = tool_for_file(urlparse(url).path)
+        if analyzer is not None:
+            selected.extend(["download_file", analyzer])
+        else:
+            selected.append("fetch_url") # a web page: read it as text
+        confident = True
+
+    if "wikipedia" in (question or "").lower():
+        selected.extend(SEARCH_TOOLS)
+        confident = True
+    if "arxiv" in (question or "").lower():
+        selected.extend(ARXIV_TOOLS)
+        confident = True
+    if "chess" in (question or "").lower():
+        selected.append("solve_chess_position")
+        confident = True
+
+    if not confident:
+        return None
+
+    # Arithmetic, code execution and a web search are cheap fallbacks worth keeping for every routed question
+    selected.extend(CALCULATOR_TOOLS + ["run_python", "web_search"])
+    return list(dict.fromkeys(selected))
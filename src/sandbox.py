@@ -0,0 +1,215 @@
+"""
+Pool of pre-started, resource-limited Python worker interpreters.
+
+Each worker is a separate interpreter that has already imported the common data
+libraries (numpy, pandas, ...) and waits for a single job. Running code therefore
+skips interpreter and import startup. Every worker runs one job and then exits,
+so no state leaks between calls. A replacement is started in the background
+right away.
+
+This file is also the worker program itself (run as a script by the pool), so it
+must not import anything from the project.
+"""
+import ast
+import contextlib
+import io
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import traceback
+
+try:
+    import resource # POSIX only; on Windows only the wall-clock limit applies
+    import signal
+except ImportError:
+    resource = None
+
+# (module, name it is bound to in the worker namespace)
+PRELOAD_MODULES = [
+    ("numpy", "np"),
+    ("pandas", "pd"),
+    ("math", "math"),
+    ("statistics", "statistics"),
+    ("collections", "collections"),
+    ("itertools", "itertools"),
+    ("datetime", "datetime"),
+    ("re", "re"),
+    ("json", "json"),
+]
+# The only environment variables a worker sees; API keys and other secrets of the server are not passed on
+ENV_ALLOWLIST = {"PATH", "HOME", "LANG", "LANGUAGE", "TZ", "TMPDIR", "TEMP", "TMP", "SYSTEMROOT"}
+MAX_OUTPUT_CHARS = 10000
+MAX_FILE_BYTES = 64 * 1024 * 1024
+WORKER_STARTUP_TIMEOUT = 60
+
+
+# --- worker side ------------------------------------------------------------
+
+def _apply_limits(cpu_seconds: int, memory_mb: int, max_file_bytes: int = MAX_FILE_BYTES):
+    if resource is None:
+        return
+
+    def cpu_exceeded(signum, frame):
+        raise TimeoutError(f"CPU time limit of {cpu_seconds}s exceeded")
+
+    # Limits are relative to what the preloaded imports already use
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_limit = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+    signal.signal(signal.SIGXCPU, cpu_exceeded)
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 1))
+    try:
+        with open("/proc/self/statm") as f:
+            current_bytes = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+        memory_limit = current_bytes + memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    except (OSError, ValueError):
+        pass # no /proc (e.g. macOS): CPU and wall-clock limits still apply
+    resource.setrlimit(resource.RLIMIT_FSIZE, (max_file_bytes, max_file_bytes))
+
+
+def _truncate(text: str) -> str:
+    if len(text) > MAX_OUTPUT_CHARS:
+        return text[:MAX_OUTPUT_CHARS] + f"\n[... {len(text) - MAX_OUTPUT_CHARS} more characters truncated]"
+    return text
+
+
+def _execute(code: str, namespace: dict) -> dict:
+    """Runs code like a REPL cell: stdout is captured and the last expression's value is returned."""
+    stdout = io.StringIO()
+    result, error = None, None
+    try:
+        tree = ast.parse(code, mode="exec")
+        last_expr = None
+        if tree.body and isinstance(tree.body[-1], ast.Expr):
+            last_expr = ast.Expression(tree.body.pop().value)
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stdout):
+            exec(compile(tree, "<run_python>", "exec"), namespace)
+            if last_expr is not None:
+                value = eval(compile(last_expr, "<run_python>", "eval"), namespace)
+                if value is not None:
+                    result = repr(value)
+    except BaseException:
+        # Hide the sandbox frames; only the user's code is interesting
+        exc_type, exc, tb = sys.exc_info()
+        frames = [frame for frame in traceback.extract_tb(tb) if frame.filename != __file__]
+        error = "Traceback (most recent call last):\n" + "".join(traceback.format_list(frames))
+        error += "".join(traceback.format_exception_only(exc_type, exc))
+    return {
+        "stdout": _truncate(stdout.getvalue()),
+        "result": _truncate(result) if result is not None else None,
+        "error": _truncate(error) if error else None,
+    }
+
+
+def worker_main():
+    # Keep the real stdout for the protocol; anything else the code writes to fd 1 goes to stderr
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    os.dup2(2, 1)
+
+    namespace = {"__name__": "__main__"}
+    for module_name, alias in PRELOAD_MODULES:
+        try:
+            namespace[alias] = __import__(module_name)
+        except ImportError:
+            pass
+    protocol.write("READY\n")
+    protocol.flush()
+
+    line = sys.stdin.readline()
+    if not line: # the pool shut down before handing out this worker
+        return
+    job = json.loads(line)
+    if job.get("cwd"):
+        os.chdir(job["cwd"])
+    _apply_limits(job["cpu_seconds"], job["memory_mb"], job["max_file_bytes"])
+    result = _execute(job["code"], namespace)
+    protocol.write(json.dumps(result) + "\n")
+    protocol.flush()
+
+
+# --- pool side ----------------------------------------------------------------
+
+class SandboxPool:
+    """Keeps `size` warm single-use workers ready to run code."""
+
+    def __init__(self, size: int = 2, cpu_seconds: int = 10, memory_mb: int = 1024, wall_seconds: float = 30):
+        self.size = size
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.wall_seconds = wall_seconds
+        self._ready = queue.Queue()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def _start_worker(self):
+        env = {key: value for key, value in os.environ.items() if key in ENV_ALLOWLIST or key.startswith("LC_")}
+        proc = subprocess.Popen(
+            [sys.executable, "-u", os.path.abspath(__file__)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, encoding="utf-8", env=env,
+        )
+        line = proc.stdout.readline()
+        if line.strip() != "READY":
+            proc.kill()
+            proc.communicate()
+            raise RuntimeError("Python worker failed to start.")
+        return proc
+
+    def _replenish(self):
+        try:
+            self._ready.put(self._start_worker())
+        except Exception as e:
+            print(f"Warning: could not start Python worker: {e}")
+
+    def start(self):
+        """Starts warming up the workers in the background. Safe to call more than once."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.size):
+            threading.Thread(target=self._replenish, daemon=True).start()
+
+    def _take_worker(self):
+        self.start()
+        try:
+            proc = self._ready.get(timeout=WORKER_STARTUP_TIMEOUT if self.size else 0)
+        except queue.Empty:
+            proc = self._start_worker()
+        if proc.poll() is not None: # died while idle
+            proc = self._start_worker()
+        threading.Thread(target=self._replenish, daemon=True).start()
+        return proc
+
+    def run(self, code: str, cwd: str = None, max_file_bytes: int = None) -> dict:
+        """
+        Runs code in a fresh worker and returns its stdout, result and error. No file the
+        code writes may grow beyond max_file_bytes (default: MAX_FILE_BYTES).
+        """
+        proc = self._take_worker()
+        job = json.dumps({
+            "code": code, "cwd": cwd, "cpu_seconds": self.cpu_seconds, "memory_mb": self.memory_mb,
+            "max_file_bytes": min(max_file_bytes, MAX_FILE_BYTES) if max_file_bytes is not None else MAX_FILE_BYTES,
+        })
+        try:
+            out, err = proc.communicate(job + "\n", timeout=self.wall_seconds)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            return {"stdout": "", "result": None, "error": f"Wall-clock limit of {self.wall_seconds}s exceeded."}
+
+        lines = out.strip().splitlines()
+        if not lines:
+            reason = f"exit code {proc.returncode}"
+            if resource is not None and proc.returncode == -signal.SIGKILL:
+                reason = "killed, probably for exceeding the CPU or memory limit"
+            detail = err.strip().splitlines()[-1] if err.strip() else ""
+            return {"stdout": "", "result": None, "error": f"Python worker died ({reason}). {detail}".strip()}
+        return json.loads(lines[-1])
+
+
+if __name__ == "__main__":
+    worker_main()
@@ -0,0 +1,155 @@
+"""
+Request scheduling for serving several users at once.
+
+All users share the compiled graphs from agent.get_agent(); what is limited is how
+many questions run at the same time. FairScheduler keeps one FIFO queue per user
+and its workers take jobs round-robin across users, so someone submitting a whole
+evaluation batch cannot starve a user asking a single question.
+
+    AGENT_SERVE_CONCURRENCY         questions answered at the same time (default: 4)
+    AGENT_SERVE_MAX_QUEUED_PER_USER waiting questions allowed per user (default: 20, 0 = unlimited)
+    AGENT_SERVE_QUEUE_SIZE          Gradio's own event queue size (default: 64)
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable
+
+SERVE_CONCURRENCY = int(os.getenv("AGENT_SERVE_CONCURRENCY", "4"))
+SERVE_MAX_QUEUED_PER_USER = int(os.getenv("AGENT_SERVE_MAX_QUEUED_PER_USER", "20"))
+SERVE_QUEUE_SIZE = int(os.getenv("AGENT_SERVE_QUEUE_SIZE", "64"))
+MAX_RECORDED_JOBS = 10000
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a user already has the maximum number of questions waiting."""
+
+
+def percentile(values: Iterable[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0-100) of values; 0.0 for no values."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(values: Iterable[float]) -> Dict[str, float]:
+    values = list(values)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": max(values, default=0.0),
+    }
+
+
+class _Job:
+    __slots__ = ("user", "fn", "args", "kwargs", "future", "enqueued")
+
+    def __init__(self, user, fn, args, kwargs):
+        self.user = user
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class FairScheduler:
+    """Runs submitted calls on a fixed number of worker threads, round-robin across users."""
+
+    def __init__(self, concurrency: int = SERVE_CONCURRENCY, max_queued_per_user: int = SERVE_MAX_QUEUED_PER_USER):
+        self.concurrency = max(1, concurrency)
+        self.max_queued_per_user = max_queued_per_user
+        self._queues = OrderedDict() # user -> deque of jobs; the order is the rotation order
+        self._condition = threading.Condition()
+        self._running = 0
+        # (user, queue wait, run time) of finished jobs
+        self._finished = deque(maxlen=MAX_RECORDED_JOBS)
+        self._workers = []
+
+    def _ensure_workers(self):
+        if not self._workers:
+            for number in range(self.concurrency):
+                worker = threading.Thread(target=self._work, name=f"serve-worker-{number}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, user: str, fn: Callable, *args, **kwargs) -> Future:
+        """Queues fn(*args, **kwargs) on behalf of user and returns a Future for its result."""
+        job = _Job(user, fn, args, kwargs)
+        with self._condition:
+            self._ensure_workers()
+            queue = self._queues.get(user)
+            if queue is None:
+                queue = self._queues[user] = deque() # new users join at the end of the rotation
+            if self.max_queued_per_user and len(queue) >= self.max_queued_per_user:
+                raise QueueFullError(f"{len(queue)} questions from '{user}' are already waiting")
+            queue.append(job)
+            self._condition.notify()
+        return job.future
+
+    def _next_job(self) -> _Job:
+        """Pops the oldest job of the user at the front of the rotation (lock held)."""
+        user, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        del self._queues[user]
+        if queue:
+            self._queues[user] = queue # back of the rotation
+        return job
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queues:
+                    self._condition.wait()
+                job = self._next_job()
+                if not job.future.set_running_or_notify_cancel():
+                    continue # cancelled while waiting
+                self._running += 1
+            started = time.perf_counter()
+            try:
+                job.future.set_result(job.fn(*job.args, **job.kwargs))
+            except BaseException as e:
+                job.future.set_exception(e)
+            finally:
+                finished = time.perf_counter()
+                with self._condition:
+                    self._running -= 1
+                    self._finished.append((job.user, started - job.enqueued, finished - started))
+
+    def waiting(self, user: str = None) -> int:
+        """Number of queued (not yet running or cancelled) jobs, of one user or of everyone."""
+        with self._condition:
+            queues = [self._queues.get(user, ())] if user is not None else self._queues.values()
+            # Cancelled jobs stay queued until a worker pops and skips them
+            return sum(not job.future.cancelled() for queue in queues for job in queue)
+
+    def running(self) -> int:
+        with self._condition:
+            return self._running
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Queue wait and run time summaries (seconds) of the finished jobs."""
+        with self._condition:
+            finished = list(self._finished)
+        return {
+            "queue_wait": summarize(wait for _, wait, _ in finished),
+            "run_time": summarize(run for _, _, run in finished),
+            "total": summarize(wait + run for _, wait, run in finished),
+        }
+
+    def stats_text(self) -> str:
+        stats = self.stats()
+        if not stats["total"]["count"]:
+            return "no questions served yet"
+        return "; ".join(
+            f"{name.replace('_', ' ')} p50 {s['p50']:.2f}s, p90 {s['p90']:.2f}s, p99 {s['p99']:.2f}s"
+            for name, s in stats.items()
+        ) + f" over {stats['total']['count']} questions"
@@ -0,0 +1,379 @@
+"""
+Per-task scratch workspaces with disk quotas and garbage collection.
+
+Every question runs inside task_workspace(task_id): attachments, downloads and files
+written by run_python land in that task's directory under AGENT_WORKSPACE_ROOT, and
+the directory is deleted when the question is answered. Workspaces of questions that
+failed are kept (an interrupted question resumes with its files in place) until they
+are older than AGENT_WORKSPACE_MAX_AGE_HOURS, which defaults to the lifetime of
+unfinished checkpoints (AGENT_CHECKPOINT_MAX_AGE_HOURS). A question resumed after its
+workspace was collected anyway (e.g. under quota pressure) sees recreated == True.
+
+File contents live once in a content-addressed blob store and are hardlinked into
+the workspaces that use them, so the same attachment or download costs disk space
+once however many tasks read it. Blobs no workspace links to are collected by age,
+or least recently used first when the store is over quota.
+
+    AGENT_WORKSPACE_ROOT           base directory (default: <tmp>/agent_workspaces)
+    AGENT_WORKSPACE_TASK_QUOTA_MB  disk space one task may use (default: 500)
+    AGENT_WORKSPACE_TOTAL_QUOTA_MB disk space of all workspaces and blobs (default: 5000)
+    AGENT_WORKSPACE_MAX_AGE_HOURS  age after which unused workspaces and blobs are removed (default: 72)
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+WORKSPACE_ROOT = os.getenv("AGENT_WORKSPACE_ROOT", os.path.join(tempfile.gettempdir(), "agent_workspaces"))
+TASK_QUOTA_BYTES = int(float(os.getenv("AGENT_WORKSPACE_TASK_QUOTA_MB", "500")) * 1024 * 1024)
+TOTAL_QUOTA_BYTES = int(float(os.getenv("AGENT_WORKSPACE_TOTAL_QUOTA_MB", "5000")) * 1024 * 1024)
+# Kept as long as checkpoints of unfinished questions, so a resumed question still finds its files
+MAX_AGE_SECONDS = float(os.getenv(
+    "AGENT_WORKSPACE_MAX_AGE_HOURS", os.getenv("AGENT_CHECKPOINT_MAX_AGE_HOURS", "72")
+)) * 3600
+GC_INTERVAL_SECONDS = 60
+# Unfinished writes to the incoming directory older than this were abandoned
+INCOMING_MAX_AGE_SECONDS = 3600
+# A newly stored blob is unreferenced until it is linked into a workspace a moment later
+BLOB_LINK_GRACE_SECONDS = 60
+
+TASKS_DIR = os.path.join(WORKSPACE_ROOT, "tasks")
+BLOBS_DIR = os.path.join(WORKSPACE_ROOT, "blobs")
+INCOMING_DIR = os.path.join(WORKSPACE_ROOT, "incoming")
+SCRATCH_DIR = os.path.join(WORKSPACE_ROOT, "scratch")
+
+
+class WorkspaceQuotaError(RuntimeError):
+    """Raised when a write would take a task or the whole store over its disk quota."""
+
+
+_current_workspace: ContextVar[Optional["Workspace"]] = ContextVar("current_workspace", default=None)
+_active = {} # workspace name -> number of open task_workspace() blocks
+_recreated = set() # names of active workspaces whose directory did not exist when they were entered
+_active_lock = threading.Lock()
+_gc_lock = threading.Lock()
+_last_gc = 0.0
+
+
+def _tree_size(path: str, seen_inodes: set) -> int:
+    """Bytes used under path, counting hardlinked files once."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                stat = os.lstat(os.path.join(dirpath, filename))
+            except OSError:
+                continue # removed while walking
+            if (stat.st_dev, stat.st_ino) not in seen_inodes:
+                seen_inodes.add((stat.st_dev, stat.st_ino))
+                total += stat.st_blocks * 512 if hasattr(stat, "st_blocks") else stat.st_size
+    return total
+
+
+def total_usage() -> int:
+    return _tree_size(WORKSPACE_ROOT, set())
+
+
+def _workspace_name(task_id: str) -> str:
+    # Readable and filesystem-safe, with a hash so different ids never share a directory
+    readable = re.sub(r"[^A-Za-z0-9_.-]+", "_", task_id)[:60]
+    return f"{readable}-{hashlib.sha1(task_id.encode('utf-8')).hexdigest()[:8]}"
+
+
+class Workspace:
+    """The scratch directory of one task."""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.name = _workspace_name(task_id)
+        self.path = os.path.join(TASKS_DIR, self.name)
+
+    @property
+    def recreated(self) -> bool:
+        """True if the directory was (re)created by the current task_workspace() blocks, i.e. holds no earlier files."""
+        with _active_lock:
+            return self.name in _recreated
+
+    def usage(self) -> int:
+        return _tree_size(self.path, set())
+
+    def remaining_quota(self) -> int:
+        return max(0, TASK_QUOTA_BYTES - self.usage())
+
+    def check_task_quota(self, extra_bytes: int = 0):
+        """Raises WorkspaceQuotaError if extra_bytes more would take this task over its quota."""
+        if self.usage() + extra_bytes > TASK_QUOTA_BYTES:
+            raise WorkspaceQuotaError(f"task workspace quota of {TASK_QUOTA_BYTES / (1024 * 1024):g} MB exceeded")
+
+    def check_quota(self, extra_bytes: int = 0):
+        """Raises WorkspaceQuotaError if writing extra_bytes more would exceed a quota."""
+        self.check_task_quota(extra_bytes)
+        check_total_quota(extra_bytes)
+
+    def file_path(self, name: str) -> str:
+        """Path of a file called name inside the workspace (never outside it)."""
+        name = os.path.basename(name.replace("\\", "/")) or "file"
+        return os.path.join(self.path, name)
+
+    def add_blob(self, blob_path: str, name: str) -> str:
+        """Links a blob into the workspace as name and returns the new path."""
+        target = self.file_path(name)
+        if os.path.exists(target):
+            if os.path.samefile(target, blob_path):
+                return target
+            os.remove(target)
+        # A link costs the store nothing, but the task is charged for the file's full size
+        self.check_task_quota(os.path.getsize(blob_path))
+        try:
+            os.link(blob_path, target)
+        except OSError:
+            shutil.copyfile(blob_path, target) # no hardlinks on this filesystem
+        os.utime(blob_path) # recently used blobs are collected last
+        return target
+
+    def discard_writes_over_quota(self, since: float) -> bool:
+        """
+        If the task is over its quota, removes the files written (not linked) in the
+        workspace since the given time and returns True.
+        """
+        if self.usage() <= TASK_QUOTA_BYTES:
+            return False
+        for dirpath, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.lstat(path)
+                    if stat.st_mtime >= since and stat.st_nlink == 1:
+                        os.remove(path)
+                except OSError:
+                    continue
+        return True
+
+    def add_bytes(self, name: str, data: bytes) -> str:
+        """Stores data (shared with identical files of other tasks) and returns its path in the workspace."""
+        self.check_task_quota(len(data)) # before writing; store_file() checks the total quota
+        return self.add_blob(store_bytes(data), name)
+
+
+def current_workspace() -> Optional[Workspace]:
+    """The workspace of the task running in this context, if any."""
+    return _current_workspace.get()
+
+
+@contextmanager
+def task_workspace(task_id: str):
+    """
+    Makes a task's workspace current for the enclosed block and yields it.
+
+    Blocks for the same task may nest or run in several threads at once; the
+    directory is deleted when the last of them exits without an exception.
+    """
+    workspace = Workspace(task_id)
+    with _active_lock:
+        if workspace.name not in _active and not os.path.isdir(workspace.path):
+            _recreated.add(workspace.name)
+        _active[workspace.name] = _active.get(workspace.name, 0) + 1
+    os.makedirs(workspace.path, exist_ok=True)
+    os.utime(workspace.path)
+    maybe_collect_garbage()
+    token = _current_workspace.set(workspace)
+    succeeded = False
+    try:
+        yield workspace
+        succeeded = True
+    finally:
+        _current_workspace.reset(token)
+        with _active_lock:
+            _active[workspace.name] -= 1
+            last = _active[workspace.name] == 0
+            if last:
+                del _active[workspace.name]
+                _recreated.discard(workspace.name)
+        if last and succeeded:
+            shutil.rmtree(workspace.path, ignore_errors=True)
+
+
+# --- blob store ------------------------------------------------------------
+
+def new_incoming_file(suffix: str = ""):
+    """Opens a temporary file for a write in progress; pass its name to store_file() when done."""
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    return tempfile.NamedTemporaryFile(delete=False, dir=INCOMING_DIR, suffix=suffix)
+
+
+def store_file(path: str) -> str:
+    """
+    Moves a finished file into the blob store (or drops it if the content is already
+    there) and returns the blob path. Blobs are named by content hash only, so the same
+    bytes are stored once whatever the files linking to them are called.
+
+    Raises WorkspaceQuotaError (and drops the file) if new content takes the store over
+    its total quota.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest = digest.hexdigest()
+    blob_dir = os.path.join(BLOBS_DIR, digest[:2])
+    os.makedirs(blob_dir, exist_ok=True)
+    blob_path = os.path.join(blob_dir, digest)
+    if os.path.exists(blob_path):
+        os.remove(path)
+    else:
+        try:
+            check_total_quota() # the file is already written, so it is part of the usage
+        except WorkspaceQuotaError:
+            os.remove(path)
+            raise
+        os.replace(path, blob_path)
+        os.chmod(blob_path, 0o444) # shared between tasks, so never modified in place
+    os.utime(blob_path)
+    return blob_path
+
+
+def store_bytes(data: bytes) -> str:
+    with new_incoming_file() as f:
+        f.write(data)
+    return store_file(f.name)
+
+
+def link_to_current_workspace(blob_path: str, name: str) -> str:
+    """Links a blob into the current task's workspace; without a current task the blob path is returned."""
+    workspace = current_workspace()
+    return workspace.add_blob(blob_path, name) if workspace else blob_path
+
+
+def scratch_directory() -> str:
+    """A new private directory for short-lived files; the caller removes it."""
+    os.makedirs(SCRATCH_DIR, exist_ok=True)
+    return tempfile.mkdtemp(dir=SCRATCH_DIR)
+
+
+# --- quotas and garbage collection -------------------------------------------
+
+def check_total_quota(extra_bytes: int = 0):
+    """Raises WorkspaceQuotaError if extra_bytes more can't fit even after collecting garbage."""
+    if total_usage() + extra_bytes <= TOTAL_QUOTA_BYTES:
+        return
+    collect_garbage(needed_bytes=extra_bytes)
+    if total_usage() + extra_bytes > TOTAL_QUOTA_BYTES:
+        raise WorkspaceQuotaError(f"workspace storage quota of {TOTAL_QUOTA_BYTES / (1024 * 1024):g} MB exceeded")
+
+
+def write_allowance() -> int:
+    """Bytes a new write may add: what is left of the total quota and of the current task's quota."""
+    allowance = max(0, TOTAL_QUOTA_BYTES - total_usage())
+    workspace = current_workspace()
+    return min(allowance, workspace.remaining_quota()) if workspace else allowance
+
+
+def _entries(directory: str, depth: int = 1):
+    """(mtime, path) of the entries depth levels below directory."""
+    paths = [directory]
+    for _ in range(depth):
+        paths = [os.path.join(p, name) for p in paths if os.path.isdir(p) for name in os.listdir(p)]
+    entries = []
+    for path in paths:
+        try:
+            entries.append((os.lstat(path).st_mtime, path))
+        except OSError:
+            continue
+    return entries
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def collect_garbage(needed_bytes: int = 0) -> int:
+    """
+    Removes stale workspaces, abandoned incoming files and unreferenced blobs, then
+    evicts the least recently used ones until the store is under quota. Returns the
+    number of entries removed.
+    """
+    global _last_gc
+    with _gc_lock:
+        _last_gc = time.time()
+        now = time.time()
+        with _active_lock:
+            active = {os.path.join(TASKS_DIR, name) for name in _active}
+
+        removed = 0
+        for mtime, path in _entries(INCOMING_DIR) + _entries(SCRATCH_DIR):
+            if now - mtime > INCOMING_MAX_AGE_SECONDS:
+                _remove(path)
+                removed += 1
+
+        def unused_entries():
+            """Inactive workspaces and blobs no workspace links to, least recently used first."""
+            workspaces = [(mtime, path) for mtime, path in _entries(TASKS_DIR) if path not in active]
+            blobs = [(mtime, path) for mtime, path in _entries(BLOBS_DIR, depth=2) if _link_count(path) == 1]
+            return sorted(workspaces + blobs)
+
+        # Workspaces go first, so the blobs only they used are collected in the same pass
+        for _ in range(2):
+            for mtime, path in unused_entries():
+                if now - mtime > MAX_AGE_SECONDS:
+                    _remove(path)
+                    removed += 1
+
+        # Usage is measured once and then reduced by what each removal frees. Blobs stored
+        # within the last BLOB_LINK_GRACE_SECONDS are left alone, as add_blob() may be
+        # about to link them.
+        usage = total_usage()
+        for _ in range(2):
+            if usage + needed_bytes <= TOTAL_QUOTA_BYTES:
+                break
+            for mtime, path in unused_entries():
+                if now - mtime < BLOB_LINK_GRACE_SECONDS and path.startswith(BLOBS_DIR):
+                    continue
+                usage -= _unshared_size(path)
+                _remove(path)
+                removed += 1
+                if usage + needed_bytes <= TOTAL_QUOTA_BYTES:
+                    break
+        return removed
+
+
+def _unshared_size(path: str) -> int:
+    """Bytes freed by removing path: files hardlinked from elsewhere stay on disk."""
+    files = [path] if not os.path.isdir(path) else [
+        os.path.join(dirpath, filename) for dirpath, _, filenames in os.walk(path) for filename in filenames
+    ]
+    total = 0
+    for file_path in files:
+        try:
+            stat = os.lstat(file_path)
+        except OSError:
+            continue
+        if stat.st_nlink == 1:
+            total += stat.st_blocks * 512 if hasattr(stat, "st_blocks") else stat.st_size
+    return total
+
+
+def _link_count(path: str) -> int:
+    try:
+        return os.lstat(path).st_nlink
+    except OSError:
+        return 0
+
+
+def maybe_collect_garbage():
+    """Collects garbage at most every GC_INTERVAL_SECONDS."""
+    if time.time() - _last_gc >= GC_INTERVAL_SECONDS:
+        removed = collect_garbage()
+        if removed:
+            print(f"Workspace cleanup removed {removed} stale entries")
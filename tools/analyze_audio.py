@@ -1,25 +1,37 @@
 import base64
+import os
 from langchain_core.tools import tool
 from langchain_core.messages import HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
 import httpx
 from dotenv import load_dotenv
 
+from src.filetypes import sniff_file_type
+from src.models import get_llm, tier_for
+
 load_dotenv()
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash")
 
 @tool
 def analyze_audio(audio_url: str, question: str) -> str:
     """
-    Analyze audio data from a URL using a multimodal model.
+    Analyze audio data from a URL or a local file path using a multimodal model.
     """
     # Fetch audio data
     try:
-        # Fetch audio data
-        response = httpx.get(audio_url)
-        response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-        audio_data = base64.b64encode(response.content).decode("utf-8")
+        if os.path.exists(audio_url):
+            # Local attachment: read it directly and detect its format from the content
+            with open(audio_url, "rb") as audio_file:
+                audio_bytes = audio_file.read()
+            mime_type = sniff_file_type(audio_url)[1]
+        else:
+            # Fetch audio data
+            response = httpx.get(audio_url)
+            response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
+            audio_bytes = response.content
+            mime_type = response.headers.get("content-type", "").split(";")[0]
+        if not mime_type.startswith("audio/"):
+            mime_type = "audio/mp3" # Assume mp3 when the format can't be determined
+        audio_data = base64.b64encode(audio_bytes).decode("utf-8")
 
         # Pass to LLM
         message = [
@@ -33,13 +45,13 @@ def analyze_audio(audio_url: str, question: str) -> str:
                         "type": "audio",
                         "source_type": "base64",
                         "data": audio_data,
-                        "mime_type": "audio/mp3", # Assuming mp3, might need adjustment based on actual content type
+                        "mime_type": mime_type,
                     },
                 ],
             )
         ]
 
-        llm_response = llm.invoke(message)
+        llm_response = get_llm(tier_for("analyze_audio")).invoke(message)
         return llm_response.content.strip()
 
     except httpx.MissingSchema as e:
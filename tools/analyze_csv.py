@@ -1,6 +1,21 @@
 from langchain.tools import tool
 import pandas as pd
 
+from src.cache import FutureCache, file_key
+
+# DataFrames by file_key(), so a file that was edited in place is parsed again.
+csv_cache = FutureCache(max_entries=16)
+
+
+def read_csv_cached(file_path: str) -> pd.DataFrame:
+    """Returns a CSV file as a DataFrame, parsing it at most once."""
+    return csv_cache.get_or_compute(file_key(file_path), lambda: pd.read_csv(file_path))
+
+
+def prefetch_csv(file_path: str, executor):
+    """Starts parsing a CSV file in the background."""
+    return csv_cache.prefetch(file_key(file_path), lambda: pd.read_csv(file_path), executor)
+
 @tool("analyze_csv")
 def analyze_csv(file_path: str, question: str) -> str:
     """
@@ -15,7 +30,7 @@ def analyze_csv(file_path: str, question: str) -> str:
     """
     try:
         # Load the CSV file into a DataFrame
-        df = pd.read_csv(file_path)
+        df = read_csv_cached(file_path)
 
         # Basic analysis based on the question
         if "columns" in question.lower():
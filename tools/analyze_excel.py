@@ -3,6 +3,22 @@ from langchain.tools import tool
 import pandas as pd
 from pathlib import Path
 
+from src.cache import FutureCache, file_key
+
+# First sheets by file_key(): parsing the workbook is most of analyze_excel's time, and
+# an edited file gets a new key.
+excel_cache = FutureCache(max_entries=16)
+
+
+def read_excel_cached(file_path: str) -> pd.DataFrame:
+    """Returns the first sheet of an Excel file as a DataFrame, parsing it at most once."""
+    return excel_cache.get_or_compute(file_key(file_path), lambda: pd.read_excel(file_path))
+
+
+def prefetch_excel(file_path: str, executor):
+    """Starts parsing an Excel file in the background."""
+    return excel_cache.prefetch(file_key(file_path), lambda: pd.read_excel(file_path), executor)
+
 @tool
 def analyze_excel(file_path: str, question: str) -> str:
     """
@@ -19,7 +35,7 @@ def analyze_excel(file_path: str, question: str) -> str:
             return f"Error: File not found at {file_path}"
         
         # Read Excel file
-        df = pd.read_excel(file_path)
+        df = read_excel_cached(file_path)
         
         # Basic information about the data 
         total_rows = len(df)
@@ -0,0 +1,56 @@
+import os
+from langchain_core.tools import tool
+
+from src.filetypes import sniff_file_type
+from tools.analyze_audio import analyze_audio
+from tools.analyze_csv import analyze_csv
+from tools.analyze_excel import analyze_excel
+from tools.analyze_image import analyze_image
+from tools.analyze_pdf import analyze_pdf
+
+# Text files shorter than this are returned whole
+MAX_TEXT_CHARS = 20000
+TEXT_EXTENSIONS = {".txt", ".py", ".json", ".md"}
+
+
+def dispatch_file(file_path: str, question: str) -> str:
+    """Sniffs the type of file_path from its content and runs the matching analyzer on it."""
+    extension, mime_type = sniff_file_type(file_path)
+    if extension in (".xlsx", ".xls"):
+        return analyze_excel.invoke({"file_path": file_path, "question": question})
+    if extension == ".csv":
+        return analyze_csv.invoke({"file_path": file_path, "question": question})
+    if extension == ".pdf":
+        return analyze_pdf.invoke({"file_path": file_path})
+    if mime_type.startswith("image/"):
+        return analyze_image.invoke({"img_path": file_path, "question": question})
+    if mime_type.startswith("audio/"):
+        return analyze_audio.invoke({"audio_url": file_path, "question": question})
+    if extension in TEXT_EXTENSIONS or mime_type.startswith("text/"):
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read(MAX_TEXT_CHARS + 1)
+        if len(text) > MAX_TEXT_CHARS:
+            text = text[:MAX_TEXT_CHARS] + "\n[File truncated]"
+        return f'<File type="{extension}">\n{text}\n</File>'
+    return f"Unsupported file type ({mime_type}) for {file_path}."
+
+
+@tool
+def analyze_file(file_path: str, question: str) -> str:
+    """
+    Analyzes any local file (e.g. a task attachment) by detecting its real type from its
+    content and handing it to the matching analyzer (Excel, CSV, PDF, image, audio or text).
+
+    Args:
+        file_path (str): Path to the local file.
+        question (str): Question about the file's content.
+
+    Returns:
+        str: The analyzer's result or an error message.
+    """
+    try:
+        if not os.path.exists(file_path):
+            return f"Error: File not found at {file_path}"
+        return dispatch_file(file_path, question)
+    except Exception as e:
+        return f"Error analyzing file: {str(e)}"
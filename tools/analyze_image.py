@@ -1,17 +1,19 @@
 import base64
 from langchain_core.tools import tool
 from langchain_core.messages import HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
 
+from src.filetypes import sniff_file_type
+from src.models import get_llm, tier_for
+
 load_dotenv()
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash")
 
 @tool
 def analyze_image(img_path: str, question: str) -> str:
     """
     Extract text from an image file using a multimodal model.
+    For chess positions use solve_chess_position instead, which computes the move with a chess engine.
     """
     all_text = ""
     try:
@@ -20,6 +22,9 @@ def analyze_image(img_path: str, question: str) -> str:
             image_bytes = image_file.read()
 
         image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+        mime_type = sniff_file_type(img_path)[1]
+        if not mime_type.startswith("image/"):
+            mime_type = "image/png"
 
         # Prepare the prompt including the base64 image data
         message = [
@@ -34,7 +39,7 @@ def analyze_image(img_path: str, question: str) -> str:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/png;base64,{image_base64}"
+                            "url": f"data:{mime_type};base64,{image_base64}"
                         },
                     },
                 ]
@@ -43,7 +48,7 @@ def analyze_image(img_path: str, question: str) -> str:
 
         # Call the vision-capable model
         # Call the vision-capable model with the prepared message list
-        response = llm.invoke(message)
+        response = get_llm(tier_for("analyze_image")).invoke(message)
 
         # Append extracted text
         all_text += response.content + "\n\n"
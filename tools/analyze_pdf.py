@@ -0,0 +1,212 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List
+
+import pymupdf
+from langchain_core.tools import tool
+
+# Documents with at least this many pages to extract are split across worker processes
+PARALLEL_PAGE_THRESHOLD = 40
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+# Upper bound on the text returned to the LLM in one call
+MAX_OUTPUT_CHARS = 20000
+# Plain reads extract this many pages per opening of the document
+PAGE_BATCH_SIZE = 8
+MAX_CACHED_DOCUMENTS = 16
+
+# Page count and extracted page text (by 0-based page number) keyed by file hash, least
+# recently used first. Pages are only extracted when first read, so big documents are
+# never parsed in full unless needed.
+_documents: "OrderedDict[str, dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+_process_pool = None
+
+
+def file_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_page_range(spec: str, page_count: int) -> List[int]:
+    """Turns a 1-based spec like "1-3,7,10-" into sorted 0-based page numbers."""
+    pages = set()
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            first = int(start) if start else 1
+            last = int(end) if end else page_count
+            pages.update(range(max(first, 1) - 1, min(last, page_count)))
+        elif 1 <= int(part) <= page_count:
+            pages.add(int(part) - 1)
+    return sorted(pages)
+
+
+def _extract_page_chunk(file_path: str, page_numbers: List[int]) -> Dict[int, str]:
+    """Extracts the text of some pages. Runs in a worker process for large documents."""
+    with pymupdf.open(file_path) as doc:
+        return {n: doc[n].get_text("text") for n in page_numbers}
+
+
+def _get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        # Forking a multithreaded server can copy a lock some other thread holds and deadlock the child
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        _process_pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=context)
+    return _process_pool
+
+
+def _document_entry(digest: str) -> dict:
+    """The cache entry of a document (call with _cache_lock held)."""
+    entry = _documents.get(digest)
+    if entry is None:
+        entry = _documents[digest] = {"page_count": None, "pages": {}}
+        while len(_documents) > MAX_CACHED_DOCUMENTS:
+            _documents.popitem(last=False)
+    else:
+        _documents.move_to_end(digest)
+    return entry
+
+
+def get_page_count(file_path: str, digest: str) -> int:
+    with _cache_lock:
+        count = _document_entry(digest)["page_count"]
+    if count is not None:
+        return count
+    with pymupdf.open(file_path) as doc:
+        count = doc.page_count
+    with _cache_lock:
+        _document_entry(digest)["page_count"] = count
+    return count
+
+
+def extract_pages(file_path: str, page_numbers: List[int], digest: str = None) -> Dict[int, str]:
+    """Returns {page number: text} for the given 0-based pages, extracting only uncached ones."""
+    digest = digest or file_hash(file_path)
+    with _cache_lock:
+        cached = _document_entry(digest)["pages"]
+        missing = [n for n in page_numbers if n not in cached]
+
+    if missing:
+        if len(missing) >= PARALLEL_PAGE_THRESHOLD and MAX_WORKERS > 1:
+            chunk_size = -(-len(missing) // MAX_WORKERS)
+            chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+            pool = _get_process_pool()
+            extracted = {}
+            for result in pool.map(_extract_page_chunk, [file_path] * len(chunks), chunks):
+                extracted.update(result)
+        else:
+            extracted = _extract_page_chunk(file_path, missing)
+        with _cache_lock:
+            cached.update(extracted)
+
+    with _cache_lock:
+        return {n: cached[n] for n in page_numbers}
+
+
+def keyword_excerpts(text: str, keyword: str, context_lines: int = 2) -> str:
+    """Returns the lines around each occurrence of keyword in text."""
+    lines = text.splitlines()
+    keep = set()
+    for i, line in enumerate(lines):
+        if keyword in line.lower():
+            keep.update(range(max(0, i - context_lines), min(len(lines), i + context_lines + 1)))
+    excerpt, previous = [], None
+    for i in sorted(keep):
+        if previous is not None and i != previous + 1:
+            excerpt.append("...")
+        excerpt.append(lines[i])
+        previous = i
+    return "\n".join(excerpt)
+
+
+def _fit_to_budget(text: str, used_chars: int):
+    """Cuts text to what is left of the output budget; returns it and the new character count."""
+    budget = MAX_OUTPUT_CHARS - used_chars
+    if len(text) > budget:
+        return text[:budget] + "\n[... rest of page truncated; use the keyword argument to find a passage]", MAX_OUTPUT_CHARS
+    return text, used_chars + len(text)
+
+
+def read_pages(get_texts: Callable[[List[int]], Dict[int, str]], page_count: int,
+               pages: str = "", keyword: str = "") -> str:
+    """
+    Formats the requested pages of a document as <Page/> blocks within the output budget.
+
+    get_texts maps a list of 0-based page numbers to their text; it is only asked
+    for the pages that are actually needed.
+    """
+    wanted = parse_page_range(pages, page_count) if pages else list(range(page_count))
+    if not wanted:
+        return f"Error: No pages match '{pages}'. The document has {page_count} pages."
+    keyword = keyword.strip().lower()
+
+    blocks, used_chars, truncated_after = [], 0, None
+    if keyword:
+        # Keyword reads must look at every requested page, so extract them all at once (in parallel if large)
+        texts = get_texts(wanted)
+        for i, n in enumerate(wanted):
+            excerpt = keyword_excerpts(texts[n], keyword)
+            if excerpt:
+                excerpt, used_chars = _fit_to_budget(excerpt, used_chars)
+                blocks.append(f'<Page number="{n + 1}">\n{excerpt}\n</Page>')
+            if used_chars >= MAX_OUTPUT_CHARS and i < len(wanted) - 1:
+                truncated_after = n
+                break
+        if not blocks:
+            return f"'{keyword}' was not found in the requested pages of this {page_count}-page document."
+    else:
+        # Plain reads extract a few pages at a time and stop as soon as the output budget is used up
+        texts = {}
+        for i, n in enumerate(wanted):
+            if n not in texts:
+                texts = get_texts(wanted[i:i + PAGE_BATCH_SIZE])
+            text, used_chars = _fit_to_budget(texts[n].strip(), used_chars)
+            blocks.append(f'<Page number="{n + 1}">\n{text}\n</Page>')
+            if used_chars >= MAX_OUTPUT_CHARS and i < len(wanted) - 1:
+                truncated_after = n
+                break
+
+    result = "\n\n".join(blocks)
+    if truncated_after is not None:
+        result += (f"\n\n[Output truncated after page {truncated_after + 1} of {page_count}. "
+                   f"Use the pages or keyword arguments to read the rest.]")
+    return f"Document has {page_count} pages.\n\n{result}"
+
+
+@tool
+def analyze_pdf(file_path: str, pages: str = "", keyword: str = "") -> str:
+    """
+    Reads text from a PDF file without loading the whole document.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        pages (str): Optional 1-based page range to read, e.g. "1-3,7". Defaults to reading from the first page.
+        keyword (str): Optional word or phrase; only the passages containing it are returned.
+
+    Returns:
+        str: The extracted text, one <Page/> block per page, or an error message.
+    """
+    try:
+        if not os.path.exists(file_path):
+            return f"Error: File not found at {file_path}"
+        digest = file_hash(file_path)
+        page_count = get_page_count(file_path, digest)
+        return read_pages(lambda numbers: extract_pages(file_path, numbers, digest), page_count, pages, keyword)
+    except Exception as e:
+        return f"Error reading PDF file: {str(e)}"
+
+
+if __name__ == "__main__":
+    result = analyze_pdf.invoke({"file_path": "example.pdf", "pages": "1-2"})
+    print(result)
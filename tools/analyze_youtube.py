@@ -1,36 +1,38 @@
 import re
 import json
 import os
+import shutil
 from urllib.parse import urlparse, parse_qs
 from dotenv import load_dotenv
 import yt_dlp
 
 from langchain.tools import tool
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from src.cache import FutureCache
+from src.workspace import scratch_directory
+from src.models import get_llm, tier_for
+
 load_dotenv()
 
-@tool
-def answer_question_about_youtube_video(url: str, question: str) -> str:
-    """
-    Answers a specific question about a YouTube video using its transcript, title, and description.
+# Title, description and transcript by video URL: yt-dlp takes seconds per video and
+# YouTube throttles clients that fetch the same subtitles repeatedly.
+video_cache = FutureCache(max_entries=32)
 
-    Fetches video metadata (title, description) and transcript using yt-dlp.
-    If a transcript is available, it uses an LLM to answer the provided question based on the transcript content,
-    using the title and description as additional context.
 
-    Args:
-        url (str): Full YouTube video URL (or any URL yt-dlp supports).
-        question (str): The specific question to answer about the video's content.
+def fetch_video_data(url: str) -> dict:
+    """
+    Fetches the title, description and English transcript of a video with yt-dlp.
 
-    Returns:
-        str: The answer to the question based on the video's transcript,
-             or a message indicating the transcript was unavailable or an error occurred.
+    Returns a dict with keys video_id, title, description, transcript (None if unavailable),
+    transcript_status and subtitle_file, or a dict with a single "error" key.
+    Raises yt_dlp.utils.DownloadError if the video data cannot be fetched at all.
     """
     subtitle_filename = None
     video_id = None
+    # Subtitles are written to a private directory, never to the working directory
+    subtitle_dir = scratch_directory()
     try:
         # 1. Get video info (title, description) and transcript using yt-dlp
         ydl_opts = {
@@ -40,7 +42,7 @@ def answer_question_about_youtube_video(url: str, question: str) -> str:
             'subtitlesformat': 'json3',
             'skip_download': True,
             'quiet': True,
-            'outtmpl': '%(id)s', # Base name for potential subtitle file
+            'outtmpl': os.path.join(subtitle_dir, '%(id)s'), # Base name for potential subtitle file
             'noplaylist': True,
         }
 
@@ -65,9 +67,9 @@ def answer_question_about_youtube_video(url: str, question: str) -> str:
                      elif parsed.hostname == "youtu.be":
                          video_id = parsed.path.lstrip("/")
                      if not video_id:
-                          return f"Error: Could not extract video ID from URL: {url}"
+                          return {"error": f"Error: Could not extract video ID from URL: {url}"}
                  except Exception:
-                      return f"Error: Could not extract video ID from URL: {url}"
+                      return {"error": f"Error: Could not extract video ID from URL: {url}"}
 
 
             # Construct expected subtitle filename (best guess, might include lang code later)
@@ -93,18 +95,18 @@ def answer_question_about_youtube_video(url: str, question: str) -> str:
             transcript_status = "not_found" # Possible values: not_found, found_but_empty, found_but_error, processed
 
             # List potential subtitle files matching the pattern
-            potential_files = [f for f in os.listdir('.') if f.startswith(video_id) and f.endswith('.json3')]
+            potential_files = [f for f in os.listdir(subtitle_dir) if f.startswith(video_id) and f.endswith('.json3')]
 
             if potential_files:
                 # Prioritize English if available
                 english_file = f"{video_id}.en.json3"
                 if english_file in potential_files:
-                    found_subtitle_file = english_file
+                    found_subtitle_file = os.path.join(subtitle_dir, english_file)
                 else:
                     # Otherwise, take the first one found (yt-dlp usually names it based on lang)
-                    found_subtitle_file = potential_files[0]
+                    found_subtitle_file = os.path.join(subtitle_dir, potential_files[0])
 
-                subtitle_filename = found_subtitle_file # Store the actual found filename for cleanup
+                subtitle_filename = os.path.basename(found_subtitle_file) # Reported if the transcript is unusable
                 print(f"Info: Found subtitle file: {found_subtitle_file}")
 
                 try:
@@ -138,10 +140,53 @@ def answer_question_about_youtube_video(url: str, question: str) -> str:
                     # Keep transcript_text as None
             # else: transcript_text remains None, transcript_status remains "not_found"
 
+        return {
+            "video_id": video_id,
+            "title": title,
+            "description": description,
+            "transcript": transcript_text,
+            "transcript_status": transcript_status,
+            "subtitle_file": subtitle_filename,
+        }
+    finally:
+        # Clean up the downloaded subtitle files
+        shutil.rmtree(subtitle_dir, ignore_errors=True)
+
+
+def prefetch_video_data(url: str, executor):
+    """Starts fetching a video's transcript in the background."""
+    return video_cache.prefetch(url, lambda: fetch_video_data(url), executor)
+
+
+@tool
+def answer_question_about_youtube_video(url: str, question: str) -> str:
+    """
+    Answers a specific question about a YouTube video using its transcript, title, and description.
+
+    Fetches video metadata (title, description) and transcript using yt-dlp.
+    If a transcript is available, it uses an LLM to answer the provided question based on the transcript content,
+    using the title and description as additional context.
+
+    Args:
+        url (str): Full YouTube video URL (or any URL yt-dlp supports).
+        question (str): The specific question to answer about the video's content.
+
+    Returns:
+        str: The answer to the question based on the video's transcript,
+             or a message indicating the transcript was unavailable or an error occurred.
+    """
+    try:
+        video = video_cache.get_or_compute(url, lambda: fetch_video_data(url))
+        if "error" in video:
+            return video["error"]
+        transcript_text = video["transcript"]
+        transcript_status = video["transcript_status"]
+        subtitle_filename = video["subtitle_file"]
+
         # 2. Check if transcript is available before proceeding to LLM
         if transcript_text is None:
             if transcript_status == "not_found":
-                 return f"Transcript not found for video {video_id}. Cannot answer question."
+                 return f"Transcript not found for video {video['video_id']}. Cannot answer question."
             elif transcript_status == "found_but_empty":
                  return f"Transcript file found ({subtitle_filename}) but contained no text. Cannot answer question."
             elif transcript_status == "found_but_error":
@@ -176,8 +221,8 @@ def answer_question_about_youtube_video(url: str, question: str) -> str:
         )
 
         # 4. Query LLM
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash", # Or another suitable model like gemini-pro
+        llm = get_llm(
+            tier_for("analyze_youtube"), # see src/models.py
             temperature=0.0, # Keep temperature low for factual Q&A based on context
         )
 
@@ -186,8 +231,8 @@ def answer_question_about_youtube_video(url: str, question: str) -> str:
 
         # Run the chain with the extracted info
         answer = chain.invoke({
-            "title": title,
-            "description": description if description else "Not Available",
+            "title": video["title"],
+            "description": video["description"] if video["description"] else "Not Available",
             "transcript": transcript_text, # Pass the extracted transcript
             "question": question
         })
@@ -206,25 +251,6 @@ def answer_question_about_youtube_video(url: str, question: str) -> str:
         return error_message
     except Exception as e:
         return f"An unexpected error occurred while processing {url}: {e}"
-    finally:
-        # Clean up the downloaded subtitle file if it exists and was identified
-        if subtitle_filename and os.path.exists(subtitle_filename):
-            try:
-                os.remove(subtitle_filename)
-                print(f"Cleaned up subtitle file: {subtitle_filename}")
-            except Exception as e:
-                print(f"Warning: Could not remove subtitle file {subtitle_filename}: {e}")
-        # Attempt cleanup based on video_id if filename wasn't confirmed but ID exists
-        elif video_id:
-             # Check common possible names based on yt-dlp patterns
-             possible_cleanup_files = [f"{video_id}.en.json3", f"{video_id}.json3"]
-             for fname in possible_cleanup_files:
-                  if os.path.exists(fname):
-                      try:
-                          os.remove(fname)
-                          print(f"Cleaned up potential subtitle file: {fname}")
-                      except Exception as e:
-                          print(f"Warning: Could not remove potential subtitle file {fname}: {e}")
 
 
 if __name__ == "__main__":
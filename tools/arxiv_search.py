@@ -1,36 +1,162 @@
-from langchain_community.document_loaders import ArxivLoader
+import json
+import os
+import re
+import shutil
+
+import arxiv
+import requests
 from langchain_core.tools import tool
-from typing import List
+
+from src.cache import FutureCache
+from src.workspace import check_total_quota, scratch_directory
+from tools.analyze_pdf import extract_pages, get_page_count, file_hash, read_pages
+
+MAX_RESULTS = 10
+MAX_ABSTRACT_CHARS = 1200
+MAX_CACHED_PAPERS = 32
+# Extracted page texts persist here between runs, least recently read papers removed first
+# above ARXIV_CACHE_MAX_MB; the PDFs themselves are only kept (as workspace scratch files,
+# under its quota) while their text is extracted
+CACHE_DIR = os.getenv(
+    "ARXIV_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "general_assistant_agent", "arxiv"),
+)
+CACHE_MAX_BYTES = int(float(os.getenv("ARXIV_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+# Metadata queries go through one shared client (it enforces arXiv's rate limit);
+# PDF downloads reuse one keep-alive session
+_client = arxiv.Client(page_size=MAX_RESULTS, delay_seconds=3, num_retries=3)
+_session = requests.Session()
+# Page texts by arXiv id; concurrent reads of the same paper share one download
+paper_cache = FutureCache(max_entries=MAX_CACHED_PAPERS)
+
+
+def normalize_arxiv_id(arxiv_id: str) -> str:
+    """Accepts bare ids, 'arXiv:' prefixes and abs/pdf URLs."""
+    arxiv_id = arxiv_id.strip()
+    arxiv_id = re.sub(r"^(https?://)?(www\.)?arxiv\.org/(abs|pdf)/", "", arxiv_id)
+    arxiv_id = re.sub(r"^arxiv:", "", arxiv_id, flags=re.IGNORECASE)
+    return re.sub(r"\.pdf$", "", arxiv_id)
+
+
+def _prune_disk_cache():
+    """Removes the least recently read files of CACHE_DIR until it fits in CACHE_MAX_BYTES."""
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".tmp"):
+            continue # a write in progress
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    usage = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if usage <= CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        usage -= size
+
+
+def _load_paper_pages(arxiv_id: str) -> list:
+    pages_path = os.path.join(CACHE_DIR, f"{arxiv_id.replace('/', '_')}.pages.json")
+    try:
+        with open(pages_path, "r", encoding="utf-8") as f:
+            pages = json.load(f)
+        os.utime(pages_path) # recently read papers are pruned last
+        return pages
+    except FileNotFoundError:
+        pass
+
+    response = _session.get(f"https://arxiv.org/pdf/{arxiv_id}", timeout=60)
+    response.raise_for_status()
+    if not response.content.startswith(b"%PDF"):
+        raise RuntimeError(f"arXiv did not return a PDF for '{arxiv_id}'")
+    check_total_quota(len(response.content))
+    directory = scratch_directory()
+    try:
+        pdf_path = os.path.join(directory, "paper.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(response.content)
+        digest = file_hash(pdf_path)
+        page_count = get_page_count(pdf_path, digest)
+        texts = extract_pages(pdf_path, list(range(page_count)), digest)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    pages = [texts[n] for n in range(page_count)]
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(pages_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(pages, f, ensure_ascii=False)
+    os.replace(pages_path + ".tmp", pages_path)
+    _prune_disk_cache()
+    return pages
+
+
+def get_paper_pages(arxiv_id: str) -> list:
+    """Returns the text of every page of a paper, downloading and extracting it on first use."""
+    return paper_cache.get_or_compute(arxiv_id, lambda: _load_paper_pages(arxiv_id))
+
+
+@tool
+def arxiv_search(query: str, max_results: int = MAX_RESULTS) -> str:
+    """Search arXiv and return metadata (id, title, authors, dates, abstract) for the best matches, formatted as <Document/> blocks.
+
+    This is fast and does not download papers; use arxiv_fetch_paper with an id to read a paper's full text.
+
+    Args:
+        query: The search query (arXiv query syntax such as 'au:Hinton AND ti:capsule' also works).
+        max_results: How many papers to return (at most 25).
+    """
+    try:
+        search = arxiv.Search(query=query, max_results=max(1, min(int(max_results), 25)))
+        formatted_docs = []
+        for result in _client.results(search):
+            authors = ", ".join(author.name for author in result.authors)
+            abstract = " ".join(result.summary.split())
+            if len(abstract) > MAX_ABSTRACT_CHARS:
+                abstract = abstract[:MAX_ABSTRACT_CHARS] + "..."
+            formatted_docs.append(
+                f'<Document id="{result.get_short_id()}" source="{result.entry_id}" '
+                f'published="{result.published.date()}" updated="{result.updated.date()}" '
+                f'category="{result.primary_category}">\n'
+                f'Title: {result.title}\n'
+                f'Authors: {authors}\n'
+                f'Abstract: {abstract}\n'
+                f'</Document>'
+            )
+        if not formatted_docs:
+            return f"No arXiv papers found for '{query}'."
+        return "\n\n---\n\n".join(formatted_docs)
+    except Exception as e:
+        return f"Error searching arXiv: {e}"
+
 
 @tool
-def arxiv_search(query: str) -> str:
-    """Search Arxiv for a query and return up to 2 results, formatted as <Document/> blocks.
-    
+def arxiv_fetch_paper(arxiv_id: str, pages: str = "", keyword: str = "") -> str:
+    """Read the full text of an arXiv paper by its id (e.g. "2106.09685" or "2106.09685v2").
+
+    Papers are downloaded once and cached, so repeated reads are fast.
+
     Args:
-        query: The search query.
+        arxiv_id: The arXiv id, as returned by arxiv_search.
+        pages: Optional 1-based page range to read, e.g. "1-3,7".
+        keyword: Optional word or phrase; only the passages containing it are returned.
     """
-    # load returns a List[Document]
-    search_docs: List[Document] = ArxivLoader(
-        query=query,
-        load_max_docs=2
-    ).load()
-
-    formatted_docs = []
-    for doc in search_docs:
-        # Document objects expose .metadata and .page_content
-        src  = doc.metadata.get("source", "")
-        page = doc.metadata.get("page", "")
-        text = doc.page_content
-
-        formatted_docs.append(
-            f'<Document source="{src}" page="{page}">\n'
-            f'{text}\n'
-            f'</Document>'
-        )
-
-    return "\n\n---\n\n".join(formatted_docs)
+    try:
+        arxiv_id = normalize_arxiv_id(arxiv_id)
+        paper_pages = get_paper_pages(arxiv_id)
+        text = read_pages(lambda numbers: {n: paper_pages[n] for n in numbers}, len(paper_pages), pages, keyword)
+        return f'<Document id="{arxiv_id}" source="https://arxiv.org/abs/{arxiv_id}">\n{text}\n</Document>'
+    except Exception as e:
+        return f"Error fetching arXiv paper '{arxiv_id}': {e}"
+
 
 if __name__ == "__main__":
     query = "Python programming language"
-    result = arxiv_search.invoke(input=query)
-    print(result)
\ No newline at end of file
+    result = arxiv_search.invoke(input={"query": query, "max_results": 3})
+    print(result)
@@ -0,0 +1,289 @@
+import base64
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import chess
+import chess.polyglot
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import tool
+
+from src.filetypes import sniff_file_type
+from src.models import get_llm, tier_for
+
+MATE_SCORE = 100000
+MATE_THRESHOLD = MATE_SCORE - 1000 # scores beyond this are forced mates
+MAX_PLY = 64
+DEFAULT_TIME_LIMIT = 10.0
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+
+PIECE_VALUES = {chess.PAWN: 100, chess.KNIGHT: 320, chess.BISHOP: 330, chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 0}
+# Small positional bonuses (from white's point of view, a1 = index 0) so equal-material moves are not random
+_CENTER_BONUS = [
+    0, 2, 4, 6, 6, 4, 2, 0,
+    2, 6, 8, 10, 10, 8, 6, 2,
+    4, 8, 12, 14, 14, 12, 8, 4,
+    6, 10, 14, 18, 18, 14, 10, 6,
+    6, 10, 14, 18, 18, 14, 10, 6,
+    4, 8, 12, 14, 14, 12, 8, 4,
+    2, 6, 8, 10, 10, 8, 6, 2,
+    0, 2, 4, 6, 6, 4, 2, 0,
+]
+FEN_PLACEMENT_RE = re.compile(r"(?:[pnbrqkPNBRQK1-8]{1,8}/){7}[pnbrqkPNBRQK1-8]{1,8}")
+
+TRANSCRIPTION_PROMPT = (
+    "Transcribe the chess position in this image into the piece-placement field of a FEN string. "
+    "Use the board's coordinate labels if visible; the board may be shown from black's side. "
+    "Always write the FEN from white's point of view: rank 8 first, files a to h, uppercase for white pieces, "
+    "lowercase for black pieces, digits for empty squares. Check that every rank adds up to 8 squares. "
+    "Reply with one line of the form 'FEN: <placement>' and nothing else."
+)
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+def evaluate(board: chess.Board) -> int:
+    """Static evaluation in centipawns from the side to move's point of view."""
+    score = 0
+    for square, piece in board.piece_map().items():
+        value = PIECE_VALUES[piece.piece_type]
+        if piece.piece_type in (chess.KNIGHT, chess.BISHOP, chess.QUEEN):
+            value += _CENTER_BONUS[square]
+        elif piece.piece_type == chess.PAWN:
+            rank = chess.square_rank(square)
+            value += 5 * (rank - 1 if piece.color == chess.WHITE else 6 - rank)
+        score += value if piece.color == chess.WHITE else -value
+    return score if board.turn == chess.WHITE else -score
+
+
+class Searcher:
+    """Iterative-deepening alpha-beta search with a transposition table and a time budget."""
+
+    def __init__(self, board: chess.Board, time_limit: float = DEFAULT_TIME_LIMIT, max_depth: int = MAX_PLY):
+        self.board = board.copy()
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        # zobrist key -> (depth, score, flag, best move)
+        self.tt: Dict[int, Tuple[int, int, int, Optional[chess.Move]]] = {}
+        self.nodes = 0
+        self.deadline = 0.0
+
+    def _capture_priority(self, move: chess.Move) -> int:
+        """Most valuable victim, least valuable attacker first."""
+        victim = self.board.piece_type_at(move.to_square) or chess.PAWN # en passant
+        return 10 * PIECE_VALUES[victim] - PIECE_VALUES[self.board.piece_type_at(move.from_square)]
+
+    def _ordered_moves(self, tt_move: Optional[chess.Move]) -> List[chess.Move]:
+        board = self.board
+
+        def priority(move):
+            if move == tt_move:
+                return 100000
+            score = 0
+            if board.is_capture(move):
+                score += self._capture_priority(move) + 10000
+            if move.promotion:
+                score += PIECE_VALUES[move.promotion] + 5000
+            if board.gives_check(move):
+                score += 2000
+            return score
+
+        return sorted(board.legal_moves, key=priority, reverse=True)
+
+    def _quiesce(self, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        stand_pat = evaluate(self.board)
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        if ply >= MAX_PLY:
+            return stand_pat
+        captures = sorted(self.board.generate_legal_captures(), key=self._capture_priority, reverse=True)
+        for move in captures:
+            self.board.push(move)
+            score = -self._quiesce(-beta, -alpha, ply + 1)
+            self.board.pop()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    def _negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes % 1024 == 0 and time.perf_counter() > self.deadline:
+            raise _SearchTimeout()
+        board = self.board
+        if ply and (board.halfmove_clock >= 100 or board.is_repetition(2) or board.is_insufficient_material()):
+            return 0
+        in_check = board.is_check()
+        if in_check and ply < MAX_PLY:
+            depth += 1 # check extension: forced lines (and mates) are seen through
+        if depth <= 0:
+            return self._quiesce(alpha, beta, ply)
+
+        key = chess.polyglot.zobrist_hash(board)
+        entry = self.tt.get(key)
+        tt_move = None
+        if entry:
+            entry_depth, entry_score, flag, tt_move = entry
+            # Mate scores are stored relative to the node, not the root
+            if entry_score > MATE_THRESHOLD:
+                entry_score -= ply
+            elif entry_score < -MATE_THRESHOLD:
+                entry_score += ply
+            if ply and entry_depth >= depth:
+                if flag == TT_EXACT:
+                    return entry_score
+                if flag == TT_LOWER:
+                    alpha = max(alpha, entry_score)
+                elif flag == TT_UPPER:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
+
+        moves = self._ordered_moves(tt_move)
+        if not moves:
+            return -(MATE_SCORE - ply) if in_check else 0 # checkmate or stalemate
+
+        original_alpha = alpha
+        best_score, best_move = -MATE_SCORE - 1, None
+        for move in moves:
+            board.push(move)
+            score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        flag = TT_UPPER if best_score <= original_alpha else TT_LOWER if best_score >= beta else TT_EXACT
+        stored = best_score + ply if best_score > MATE_THRESHOLD else best_score - ply if best_score < -MATE_THRESHOLD else best_score
+        self.tt[key] = (depth, stored, flag, best_move)
+        return best_score
+
+    def principal_variation(self, max_length: int = 20) -> List[chess.Move]:
+        board = self.board.copy()
+        line, seen = [], set()
+        while len(line) < max_length:
+            key = chess.polyglot.zobrist_hash(board)
+            entry = self.tt.get(key)
+            if not entry or entry[3] is None or key in seen or entry[3] not in board.legal_moves:
+                break
+            seen.add(key)
+            line.append(entry[3])
+            board.push(entry[3])
+        return line
+
+    def search(self) -> Dict:
+        """Returns {"move", "score", "mate_in", "depth", "pv", "nodes", "seconds"} for the best move found."""
+        start = time.perf_counter()
+        self.deadline = start + self.time_limit
+        result = {"move": None, "score": 0, "mate_in": None, "depth": 0, "pv": []}
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score = self._negamax(depth, -MATE_SCORE - 1, MATE_SCORE + 1, 0)
+            except _SearchTimeout:
+                break
+            pv = self.principal_variation()
+            result.update(move=pv[0] if pv else None, score=score, depth=depth, pv=pv)
+            if abs(score) > MATE_THRESHOLD:
+                plies = MATE_SCORE - abs(score)
+                result["mate_in"] = (plies + 1) // 2 if score > 0 else -(plies // 2)
+                break # the shortest forced mate is found at the first depth that reaches it
+            if time.perf_counter() - start > self.time_limit / 2:
+                break # the next iteration would not finish in time
+        if result["move"] is None and self.board.legal_moves.count():
+            result["move"] = self._ordered_moves(None)[0]
+            result["pv"] = [result["move"]]
+        result.update(nodes=self.nodes, seconds=time.perf_counter() - start)
+        return result
+
+
+def infer_castling_rights(board: chess.Board) -> str:
+    """Castling rights consistent with kings and rooks still on their starting squares."""
+    rights = ""
+    for color, rank, letters in ((chess.WHITE, 0, "KQ"), (chess.BLACK, 7, "kq")):
+        if board.piece_at(chess.square(4, rank)) != chess.Piece(chess.KING, color):
+            continue
+        if board.piece_at(chess.square(7, rank)) == chess.Piece(chess.ROOK, color):
+            rights += letters[0]
+        if board.piece_at(chess.square(0, rank)) == chess.Piece(chess.ROOK, color):
+            rights += letters[1]
+    return rights or "-"
+
+
+def board_from_placement(placement: str, side_to_move: str) -> chess.Board:
+    """Builds a full position from a FEN placement field (a full FEN is used as is)."""
+    placement = placement.strip()
+    if " " in placement:
+        return chess.Board(placement)
+    board = chess.Board(f"{placement} {'b' if side_to_move.lower().startswith('b') else 'w'} - - 0 1")
+    board.set_castling_fen(infer_castling_rights(board))
+    return board
+
+
+def transcribe_board(img_path: str) -> str:
+    """Asks the vision model for the FEN placement field of a board image."""
+    with open(img_path, "rb") as image_file:
+        image_base64 = base64.b64encode(image_file.read()).decode("utf-8")
+    mime_type = sniff_file_type(img_path)[1]
+    if not mime_type.startswith("image/"):
+        mime_type = "image/png"
+    message = [HumanMessage(content=[
+        {"type": "text", "text": TRANSCRIPTION_PROMPT},
+        {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_base64}"}},
+    ])]
+    response = get_llm(tier_for("chess_transcription"), temperature=0.0).invoke(message)
+    match = FEN_PLACEMENT_RE.search(response.content if isinstance(response.content, str) else str(response.content))
+    if not match:
+        raise ValueError(f"could not read a FEN from the model's transcription: {response.content!r}")
+    return match.group(0)
+
+
+def format_result(board: chess.Board, result: Dict) -> str:
+    if result["move"] is None:
+        return f"FEN: {board.fen()}\nNo legal moves: {'checkmate' if board.is_checkmate() else 'stalemate'}."
+    if result["mate_in"] is not None:
+        evaluation = f"mate in {result['mate_in']}" if result["mate_in"] > 0 else f"gets mated in {-result['mate_in']}"
+    else:
+        evaluation = f"{result['score'] / 100:+.2f} pawns for the side to move"
+    return (
+        f"FEN: {board.fen()}\n"
+        f"Best move: {board.san(result['move'])} ({board.uci(result['move'])})\n"
+        f"Evaluation: {evaluation}\n"
+        f"Line: {board.variation_san(result['pv'])}\n"
+        f"Search: depth {result['depth']}, {result['nodes']} nodes in {result['seconds']:.1f}s"
+    )
+
+
+@tool
+def solve_chess_position(img_path: str = "", fen: str = "", side_to_move: str = "white", time_limit: float = DEFAULT_TIME_LIMIT) -> str:
+    """Find the best move (and forced mate line, if any) in a chess position, given a board image or a FEN.
+
+    The image is transcribed to FEN by a vision model and the move is computed by a local chess engine,
+    so the answer is deterministic. The reply contains the FEN that was used; if it looks wrong, call again
+    with a corrected fen.
+
+    Args:
+        img_path: Local path of a board image.
+        fen: A FEN string (full, or only the piece placement); used instead of the image when given.
+        side_to_move: "white" or "black" (ignored when a full FEN is given).
+        time_limit: Seconds the engine may think (at most 60).
+    """
+    try:
+        placement = fen or transcribe_board(img_path)
+        board = board_from_placement(placement, side_to_move)
+        if not board.is_valid():
+            return f"The position {board.fen()} is not legal ({board.status()!r}); check the transcription and pass a corrected fen."
+        result = Searcher(board, time_limit=max(0.5, min(float(time_limit), 60.0))).search()
+        return format_result(board, result)
+    except Exception as e:
+        return f"Error solving chess position: {e}"
+
+
+if __name__ == "__main__":
+    # Mate in 2 for white: 1. Nf6+ gxf6 2. Bxf7#
+    print(solve_chess_position.invoke({"fen": "r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 1"}))
@@ -1,13 +1,58 @@
 import os
 import requests
-import tempfile
+from urllib.parse import urlparse
 from langchain.tools import tool
 
+from src.cache import FutureCache
+from src.workspace import (
+    WorkspaceQuotaError, check_total_quota, link_to_current_workspace, new_incoming_file, store_file, write_allowance,
+)
+
+# Blob paths by URL. Blobs can be garbage-collected, so get_downloaded_file() checks the path still exists.
+download_cache = FutureCache(max_entries=64)
+
+
+def fetch_to_blob(url: str) -> str:
+    """Streams url into the shared blob store (keeping its extension) and returns the blob path."""
+    # Make a GET request to the URL
+    response = requests.get(url, stream=True, timeout=30)
+    response.raise_for_status()  # Raise an error for bad status codes
+    check_total_quota(int(response.headers.get("Content-Length") or 0))
+
+    # Content-Length may be missing or wrong (chunked responses), so the bytes are also counted as they arrive
+    allowance = write_allowance()
+    downloaded = 0
+    with new_incoming_file() as temp_file:
+        # Write the content to the temporary file
+        for chunk in response.iter_content(chunk_size=8192):
+            downloaded += len(chunk)
+            if downloaded > allowance:
+                temp_file.close()
+                os.remove(temp_file.name)
+                raise WorkspaceQuotaError(f"download of {url} exceeds the workspace disk quota")
+            temp_file.write(chunk)
+    return store_file(temp_file.name)
+
+
+def get_downloaded_file(url: str) -> str:
+    """Returns the blob path of url, downloading it unless a stored copy still exists."""
+    path = download_cache.get_or_compute(url, lambda: fetch_to_blob(url))
+    if not os.path.exists(path):
+        download_cache.invalidate(url)
+        path = download_cache.get_or_compute(url, lambda: fetch_to_blob(url))
+    return path
+
+
+def prefetch_download(url: str, executor):
+    """Starts downloading url in the background."""
+    return download_cache.prefetch(url, lambda: fetch_to_blob(url), executor)
+
+
 @tool("download_file")
 def download_file(url: str) -> str:
     """
-    Downloads a file from the given URL and saves it to a temporary location.
-    Returns the path to the downloaded file.
+    Downloads a file from the given URL and saves it to the task's workspace.
+    Returns the path to the downloaded file. To read a web page as text, use fetch_url instead.
 
     Args:
         url (str): The URL of the file to download.
@@ -16,19 +61,9 @@ def download_file(url: str) -> str:
         str: The path to the downloaded file.
     """
     try:
-        # Make a GET request to the URL
-        response = requests.get(url, stream=True)
-        response.raise_for_status()  # Raise an error for bad status codes
-
-        # Create a temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        temp_file_path = temp_file.name
-
-        # Write the content to the temporary file
-        with open(temp_file_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        return "File downloaded and saved successfully to {temp_file_path}. Read this file to process its content."
+        # Linked under the URL's file name, so its extension keeps the file type obvious
+        file_name = os.path.basename(urlparse(url).path) or "download"
+        temp_file_path = link_to_current_workspace(get_downloaded_file(url), file_name)
+        return f"File downloaded and saved successfully to {temp_file_path}. Read this file to process its content."
     except Exception as e:
-        return f"An error occurred while downloading the file: {e}"
\ No newline at end of file
+        return f"An error occurred while downloading the file: {e}"
@@ -0,0 +1,174 @@
+import codecs
+import os
+import time
+
+import requests
+from langchain_core.tools import tool
+
+from src.cache import FutureCache
+from src.html_text import HTMLTextExtractor, render_blocks
+from src.workspace import check_total_quota, new_incoming_file, store_file
+from tools.analyze_pdf import MAX_OUTPUT_CHARS, extract_pages, file_hash, get_page_count, keyword_excerpts, read_pages
+
+CHUNK_SIZE = 64 * 1024
+# Pages are read until this many bytes were downloaded or this much text was extracted
+MAX_DOWNLOAD_BYTES = 5 * 1024 * 1024
+MAX_EXTRACTED_CHARS = 200000
+MAX_PDF_BYTES = 50 * 1024 * 1024
+# Cached pages younger than this are served without asking the server
+FRESH_SECONDS = 300
+MAX_CACHED_PAGES = 128
+# Page furniture that is rarely part of the main content
+SKIP_CLASSES = {
+    "sidebar", "menu", "navbar", "nav", "breadcrumb", "breadcrumbs", "cookie", "cookie-banner",
+    "advert", "ad", "ads", "social", "share", "comments", "related", "newsletter", "skip-link",
+}
+SKIP_IDS = {"sidebar", "menu", "nav", "navigation", "comments", "footer", "header", "cookie-banner"}
+
+_session = requests.Session()
+_session.headers["User-Agent"] = "Mozilla/5.0 (compatible; GeneralAssistantAgent/1.0)"
+# url -> {"kind": "text"|"pdf", "text" or "path"/"digest", "truncated", "etag", "last_modified", "checked"}.
+# A tool call made while the prefetch of the same page is still running waits for it.
+page_cache = FutureCache(max_entries=MAX_CACHED_PAGES) # stored PDFs are collected by the workspace GC
+
+
+def _read_html(chunks, first: bytes, encoding: str) -> dict:
+    """Feeds the response to the extractor chunk by chunk, stopping once enough text was collected."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    extractor = HTMLTextExtractor(skip_classes=SKIP_CLASSES, skip_ids=SKIP_IDS)
+    downloaded, truncated, chunk = 0, False, first
+    while chunk:
+        downloaded += len(chunk)
+        extractor.feed(decoder.decode(chunk))
+        if downloaded >= MAX_DOWNLOAD_BYTES or extractor.text_length >= MAX_EXTRACTED_CHARS:
+            truncated = True
+            break
+        chunk = next(chunks, b"")
+    extractor.close()
+    return {"kind": "text", "text": render_blocks(extractor.blocks), "truncated": truncated}
+
+
+def _read_plain(chunks, first: bytes, encoding: str) -> dict:
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    parts, downloaded, truncated, chunk = [], 0, False, first
+    while chunk:
+        downloaded += len(chunk)
+        parts.append(decoder.decode(chunk))
+        if downloaded >= MAX_DOWNLOAD_BYTES:
+            truncated = True
+            break
+        chunk = next(chunks, b"")
+    return {"kind": "text", "text": "".join(parts), "truncated": truncated}
+
+
+def _read_pdf(chunks, first: bytes) -> dict:
+    """Saves a PDF response to the blob store; its pages are extracted lazily by the PDF helpers."""
+    check_total_quota(MAX_PDF_BYTES)
+    downloaded, chunk = 0, first
+    with new_incoming_file(".pdf") as temp_file:
+        while chunk:
+            downloaded += len(chunk)
+            if downloaded > MAX_PDF_BYTES:
+                temp_file.close()
+                os.remove(temp_file.name)
+                raise RuntimeError(f"PDF is larger than {MAX_PDF_BYTES // (1024 * 1024)} MB")
+            temp_file.write(chunk)
+            chunk = next(chunks, b"")
+    digest = file_hash(temp_file.name)
+    return {"kind": "pdf", "path": store_file(temp_file.name), "digest": digest, "truncated": False}
+
+
+def _download_page(url: str, cached: dict = None) -> dict:
+    """Downloads and extracts url; with a cached copy, asks the server (ETag/Last-Modified) whether it changed."""
+    headers = {}
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    with _session.get(url, headers=headers, stream=True, timeout=(10, 30)) as response:
+        if response.status_code == 304 and cached is not None:
+            cached["checked"] = time.time()
+            return cached
+        response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "").lower()
+        # Servers often omit the charset of HTML; UTF-8 is a better guess than requests' ISO-8859-1
+        encoding = response.encoding if "charset=" in content_type else "utf-8"
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            encoding = "utf-8"
+        chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+        first = next(chunks, b"")
+
+        if "pdf" in content_type or first.startswith(b"%PDF"):
+            page = _read_pdf(chunks, first)
+        elif "html" in content_type or first.lstrip()[:1] == b"<":
+            page = _read_html(chunks, first, encoding)
+        elif content_type.startswith("text/") or "json" in content_type or "xml" in content_type:
+            page = _read_plain(chunks, first, encoding)
+        else:
+            raise RuntimeError(f"unsupported content type '{content_type}'; use download_file for binary files")
+        page.update(
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            checked=time.time(),
+            final_url=response.url,
+        )
+    return page
+
+
+def fetch_page(url: str) -> dict:
+    """Returns the cached extraction of url, revalidating it with the server when stale."""
+    page = page_cache.get_or_compute(url, lambda: _download_page(url))
+    if page["kind"] == "pdf" and not os.path.exists(page["path"]):
+        page_cache.invalidate(url)
+        page = page_cache.get_or_compute(url, lambda: _download_page(url))
+    elif time.time() - page["checked"] >= FRESH_SECONDS:
+        stale = page
+        page_cache.invalidate(url)
+        page = page_cache.get_or_compute(url, lambda: _download_page(url, cached=stale))
+    return page
+
+
+def prefetch_page(url: str, executor):
+    """Starts fetching url in the background so the later tool call hits the cache."""
+    return page_cache.prefetch(url, lambda: _download_page(url), executor)
+
+
+@tool
+def fetch_url(url: str, keyword: str = "", pages: str = "") -> str:
+    """Read a web page (or online PDF) as compact text: main content, headings and tables, without menus or scripts.
+
+    Use this to read a page found with web_search or a link given in the question. Pages are cached.
+
+    Args:
+        url: The http(s) URL to read.
+        keyword: Optional word or phrase; only the passages containing it are returned.
+        pages: For PDFs only, an optional 1-based page range such as "1-3,7".
+    """
+    try:
+        page = fetch_page(url)
+        source = page.get("final_url") or url
+        if page["kind"] == "pdf":
+            path, digest = page["path"], page["digest"]
+            text = read_pages(lambda numbers: extract_pages(path, numbers, digest),
+                              get_page_count(path, digest), pages, keyword)
+            return f'<Document source="{source}">\n{text}\n</Document>'
+
+        text = page["text"]
+        if keyword:
+            text = keyword_excerpts(text, keyword.strip().lower())
+            if not text:
+                return f"'{keyword}' was not found on {source}."
+        notes = []
+        if len(text) > MAX_OUTPUT_CHARS:
+            text = text[:MAX_OUTPUT_CHARS]
+            notes.append("Output truncated; use the keyword argument to find a specific passage.")
+        if page["truncated"]:
+            notes.append("The page is very long and was only read in part.")
+        note = "\n\n[" + " ".join(notes) + "]" if notes else ""
+        return f'<Document source="{source}">\n{text}{note}\n</Document>'
+    except Exception as e:
+        return f"Error fetching {url}: {e}"
@@ -0,0 +1,68 @@
+import os
+import shutil
+import time
+from langchain_core.tools import tool
+
+from src.sandbox import SandboxPool
+from src.workspace import current_workspace, scratch_directory
+
+# Warm worker interpreters (numpy/pandas already imported), shared by every call
+sandbox_pool = SandboxPool(
+    size=int(os.getenv("RUN_PYTHON_POOL_SIZE", "2")),
+    cpu_seconds=int(os.getenv("RUN_PYTHON_CPU_SECONDS", "10")),
+    memory_mb=int(os.getenv("RUN_PYTHON_MEMORY_MB", "1024")),
+    wall_seconds=float(os.getenv("RUN_PYTHON_WALL_SECONDS", "30")),
+)
+
+
+@tool
+def run_python(code: str = "", file_path: str = "") -> str:
+    """
+    Runs Python code in a sandboxed interpreter and returns what it printed and the value
+    of its last expression. numpy (np) and pandas (pd) are already imported.
+    Use it for real computation instead of reasoning step by step, or to run an attached .py file.
+
+    Args:
+        code (str): Python source to run. Ignored if file_path is given.
+        file_path (str): Optional path to a .py file to run instead of code.
+
+    Returns:
+        str: The captured output, the final expression's value and any error.
+    """
+    workspace, cwd = current_workspace(), None
+    try:
+        if file_path:
+            if not os.path.exists(file_path):
+                return f"Error: File not found at {file_path}"
+            with open(file_path, "r", encoding="utf-8") as f:
+                code = f.read()
+        if not code.strip():
+            return "Error: No code to run."
+        # Files the code writes belong to the task and are removed with its workspace. The
+        # directory of file_path is never used: it may be the blob store shared by all tasks.
+        cwd = workspace.path if workspace else scratch_directory()
+
+        # Each file is capped at what is left of the task's quota; many files together
+        # are caught afterwards and removed again
+        started = time.time() - 0.05 # file times lag the clock by up to a timer tick
+        outcome = sandbox_pool.run(code, cwd=cwd, max_file_bytes=workspace.remaining_quota() if workspace else None)
+        if workspace is not None and workspace.discard_writes_over_quota(started):
+            note = "The files written exceeded the task's disk quota and were removed."
+            outcome["error"] = f"{outcome['error'].rstrip()}\n{note}" if outcome["error"] else note
+        parts = []
+        if outcome["stdout"]:
+            parts.append(f"Output:\n{outcome['stdout'].rstrip()}")
+        if outcome["result"] is not None:
+            parts.append(f"Result: {outcome['result']}")
+        if outcome["error"]:
+            parts.append(f"Error:\n{outcome['error'].rstrip()}")
+        return "\n\n".join(parts) if parts else "The code ran successfully and produced no output."
+    except Exception as e:
+        return f"An unexpected error occurred while running Python code: {str(e)}"
+    finally:
+        if workspace is None and cwd is not None:
+            shutil.rmtree(cwd, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    print(run_python.invoke({"code": "import numpy as np\nprint('mean:', np.mean([1, 2, 3]))\n2 ** 10"}))
@@ -1,34 +1,110 @@
-from langchain_community.tools.tavily_search import TavilySearchResults
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import requests
+from requests.adapters import HTTPAdapter
 from langchain_core.tools import tool
 from dotenv import load_dotenv
 
 load_dotenv()
 
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+MAX_RESULTS_PER_QUERY = 3
+MAX_RAW_CONTENT_CHARS = 4000
+SEARCH_WORKERS = 4
+
+# The API is called directly through one keep-alive session (LangChain's Tavily tool
+# opens a new connection per search), so concurrent queries reuse pooled connections
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_maxsize=SEARCH_WORKERS))
+_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="web_search")
+
+
+def _search(query: str, include_raw_content: bool) -> list:
+    api_key = os.getenv("TAVILY_API_KEY")
+    if not api_key:
+        raise RuntimeError("TAVILY_API_KEY is not set")
+    # The same request body LangChain's Tavily tool sent, so recorded cassettes still replay
+    response = _session.post(TAVILY_SEARCH_URL, timeout=60, json={
+        "api_key": api_key,
+        "query": query,
+        "max_results": MAX_RESULTS_PER_QUERY,
+        "search_depth": "advanced",
+        "include_domains": [],
+        "exclude_domains": [],
+        "include_answer": False,
+        "include_raw_content": include_raw_content,
+        "include_images": False,
+    })
+    response.raise_for_status()
+    return response.json().get("results", [])
+
+
+def merge_results(results_per_query: List[list]) -> List[dict]:
+    """
+    Deduplicates results by URL across queries and ranks them: pages returned by more
+    queries first, then by Tavily's relevance score, then by first appearance.
+    """
+    merged = {}
+    for query_index, results in enumerate(results_per_query):
+        for rank, item in enumerate(results):
+            url = item.get("url", "")
+            if url not in merged:
+                merged[url] = {"item": item, "hits": 0, "score": 0.0, "first_seen": (rank, query_index)}
+            entry = merged[url]
+            entry["hits"] += 1
+            entry["score"] = max(entry["score"], float(item.get("score") or 0.0))
+            # Keep whichever copy has the longer text
+            if len(item.get("raw_content") or "") > len(entry["item"].get("raw_content") or ""):
+                entry["item"] = item
+    ranked = sorted(merged.values(), key=lambda e: (-e["hits"], -e["score"], e["first_seen"]))
+    return [entry["item"] for entry in ranked]
+
+
 @tool
-def web_search(query: str) -> str:
-    """Search Tavily for a query and return up to 3 results as <Document/> blocks."""
-    search_tool = TavilySearchResults(max_results=3)
-    # Unpack the (results_list, raw_response_dict) tuple
-    results = search_tool.invoke(input=query)  # :contentReference[oaicite:0]{index=0}
+def web_search(queries: List[str], include_raw_content: bool = False) -> str:
+    """Search Tavily for one or more queries at once and return the merged results as <Document/> blocks.
+
+    Put all the phrasings you would try into a single call: the queries run concurrently and
+    results are deduplicated by URL and ranked.
+
+    Args:
+        queries: One or more search queries.
+        include_raw_content: If true, return the page text instead of a short snippet (slower, much longer).
+    """
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    if not queries:
+        return "Error: No search query given."
+
+    futures = [_executor.submit(_search, q, include_raw_content) for q in queries]
+    results_per_query, errors = [], []
+    for query, future in zip(queries, futures):
+        try:
+            results_per_query.append(future.result())
+        except Exception as e:
+            errors.append(f"Search for '{query}' failed: {e}")
 
     formatted = []
-    for item in results:
+    for item in merge_results(results_per_query):
         url     = item.get("url", "")
         title   = item.get("title", "")
-        # choose either the short 'content' or the full 'raw_content'
-        snippet = item.get("content", "") or item.get("raw_content", "")
+        if include_raw_content and item.get("raw_content"):
+            snippet = item["raw_content"][:MAX_RAW_CONTENT_CHARS]
+        else:
+            snippet = item.get("content", "") or item.get("raw_content", "")
         formatted.append(
             f'<Document source="{url}" title="{title}">\n'
             f'{snippet}\n'
             f'</Document>'
         )
 
-    return "\n\n---\n\n".join(formatted)
+    return "\n\n---\n\n".join(errors + formatted) or "No results found."
 
 
 
 if __name__ == "__main__":
-    query = "Python programming language"
+    queries = ["Python programming language", "Python language creator"]
     # call via .invoke(input=...) since @tool wraps it as a BaseTool
-    result = web_search.invoke(input=query)
+    result = web_search.invoke(input={"queries": queries})
     print(result)
@@ -1,32 +1,176 @@
-from langchain_community.document_loaders.wikipedia import WikipediaLoader
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from urllib.parse import quote
+
+import requests
 from langchain_core.tools import tool
-from typing import List
-from langchain.schema import Document
+
+from src.cache import FutureCache
+from src.html_text import HTMLTextExtractor, render_blocks, render_table
+
+API_URL = "https://en.wikipedia.org/w/api.php"
+PAGE_URL = "https://en.wikipedia.org/wiki/"
+MAX_PAGES = 2
+MAX_SECTIONS = 3
+MAX_SECTION_CHARS = 6000
+# Wikipedia markup that is never part of the article text
+SKIP_CLASSES = {
+    "mw-editsection", "reference", "reflist", "mw-references-wrap", "navbox", "navbox-styles",
+    "metadata", "sistersitebox", "noprint", "mw-jump-link", "toc", "hatnote", "shortdescription",
+    "mw-empty-elt", "printfooter", "catlinks",
+}
+STOPWORDS = {
+    "the", "a", "an", "of", "in", "on", "at", "to", "for", "and", "or", "is", "was", "were",
+    "are", "by", "with", "from", "as", "what", "who", "when", "where", "which", "how", "many",
+    "did", "does", "do", "that", "this", "it", "its", "be", "been", "has", "have", "had",
+}
+
+# One HTTP session (keep-alive) for every Wikipedia request
+_session = requests.Session()
+_session.headers["User-Agent"] = "GeneralAssistantAgent/1.0 (https://huggingface.co/spaces)"
+_executor = ThreadPoolExecutor(max_workers=MAX_PAGES * 2, thread_name_prefix="wiki")
+# Parsed pages keyed by (title, as_of date); a pinned date always maps to the same revision
+page_cache = FutureCache(max_entries=64)
+
+
+def _api_get(**params) -> dict:
+    params.update({"format": "json", "formatversion": 2})
+    response = _session.get(API_URL, params=params, timeout=15)
+    response.raise_for_status()
+    data = response.json()
+    if "error" in data:
+        raise RuntimeError(data["error"].get("info", "Wikipedia API error"))
+    return data
+
+
+def search_titles(query: str, limit: int = MAX_PAGES) -> List[str]:
+    """Returns the titles of the best-matching articles for a query."""
+    data = _api_get(action="query", list="search", srsearch=query, srlimit=limit, srprop="")
+    return [hit["title"] for hit in data.get("query", {}).get("search", [])]
+
+
+def resolve_revision(title: str, as_of: str) -> Optional[int]:
+    """Returns the id of the last revision of a page made on or before the date as_of (YYYY-MM-DD)."""
+    data = _api_get(
+        action="query", prop="revisions", titles=title, redirects=1,
+        rvlimit=1, rvdir="older", rvstart=f"{as_of}T23:59:59Z", rvprop="ids|timestamp",
+    )
+    pages = data.get("query", {}).get("pages", [])
+    revisions = pages[0].get("revisions") if pages else None
+    return revisions[0]["revid"] if revisions else None
+
+
+def parse_sections(html: str) -> List[dict]:
+    """Splits article HTML into addressable sections; the infobox becomes its own section."""
+    extractor = HTMLTextExtractor(skip_classes=SKIP_CLASSES)
+    extractor.feed(html)
+    extractor.close()
+
+    sections = [{"title": "Introduction", "level": 1, "blocks": []}]
+    infobox = None
+    for block in extractor.blocks:
+        if block[0] == "heading" and block[1] <= 3:
+            sections.append({"title": block[2], "level": block[1], "blocks": []})
+        elif block[0] == "table" and infobox is None and "infobox" in block[2]:
+            infobox = {"title": "Infobox", "level": 1, "text": render_table(block[1])}
+        else:
+            sections[-1]["blocks"].append(block)
+
+    # Headings without text of their own are kept: they address their subsections
+    parsed = [{"title": s["title"], "level": s["level"], "text": render_blocks(s["blocks"])} for s in sections]
+    if infobox:
+        parsed.insert(0, infobox)
+    return parsed
+
+
+def fetch_page(title: str, as_of: str = "") -> dict:
+    """Fetches and parses an article (optionally as it was on a date). Results are cached."""
+    def load():
+        params = {"action": "parse", "prop": "text|revid|displaytitle", "redirects": 1, "disableeditsection": 1}
+        if as_of:
+            revid = resolve_revision(title, as_of)
+            if revid is None:
+                raise RuntimeError(f"'{title}' has no revision on or before {as_of}")
+            params["oldid"] = revid
+        else:
+            params["page"] = title
+        data = _api_get(**params)["parse"]
+        resolved_title = data.get("title", title)
+        return {
+            "title": resolved_title,
+            "url": PAGE_URL + quote(resolved_title.replace(" ", "_")),
+            "revid": data.get("revid"),
+            "sections": parse_sections(data.get("text", "")),
+        }
+    return page_cache.get_or_compute((title, as_of), load)
+
+
+def _terms(text: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9]+", text.lower()) if len(w) > 1 and w not in STOPWORDS}
+
+
+def select_sections(page: dict, query: str, section: str = "", max_sections: int = MAX_SECTIONS) -> List[dict]:
+    """Returns the requested section (with its subsections), or the introduction, infobox and best-matching sections."""
+    sections = page["sections"]
+    if section:
+        wanted = section.lower()
+        for i, s in enumerate(sections):
+            if wanted in s["title"].lower():
+                end = i + 1
+                while end < len(sections) and sections[end]["level"] > s["level"]:
+                    end += 1
+                return [c for c in sections[i:end] if c["text"]]
+
+    terms = _terms(query)
+
+    def score(s):
+        title_terms, body = _terms(s["title"]), s["text"].lower()
+        return 3 * len(terms & title_terms) + sum(min(body.count(t), 5) for t in terms)
+
+    always = [s for s in sections if s["title"] in ("Infobox", "Introduction")]
+    rest = [s for s in sections if s["title"] not in ("Infobox", "Introduction") and s["text"]]
+    best = [s for s in sorted(rest, key=score, reverse=True) if score(s) > 0][:max_sections]
+    # Present the chosen sections in article order
+    return [s for s in sections if (s in always or s in best) and s["text"]]
 
 
 @tool
-def wiki_search(query: str) -> str:
-    """Search Wikipedia for a query and return up to 2 results, formatted as <Document/> blocks.
-    
+def wiki_search(query: str, section: str = "", as_of: str = "") -> str:
+    """Search Wikipedia and return only the relevant sections (and infobox/tables) of the top articles, formatted as <Document/> blocks.
+
     Args:
-        query: The search query.
+        query: The search query, or an exact article title.
+        section: Optional section title to read (e.g. "Discography"); the list of sections is shown in every result.
+        as_of: Optional date (YYYY-MM-DD) to read the articles as they were on that day.
     """
-    # load returns a List[Document]
-    search_docs: List[Document] = WikipediaLoader(
-        query=query,
-        load_max_docs=2
-    ).load()
+    try:
+        titles = search_titles(query)
+    except Exception as e:
+        return f"Error searching Wikipedia: {e}"
+    if not titles:
+        return f"No Wikipedia articles found for '{query}'."
 
+    # Fetch the candidate pages concurrently
+    futures = [_executor.submit(fetch_page, title, as_of) for title in titles]
     formatted_docs = []
-    for doc in search_docs:
-        # Document objects expose .metadata and .page_content
-        src  = doc.metadata.get("source", "")
-        page = doc.metadata.get("page", "")
-        text = doc.page_content
+    for title, future in zip(titles, futures):
+        try:
+            page = future.result()
+        except Exception as e:
+            formatted_docs.append(f"Error fetching Wikipedia page '{title}': {e}")
+            continue
 
+        chosen = select_sections(page, query, section)
+        body = "\n\n".join(
+            f"## {s['title']}\n{s['text'][:MAX_SECTION_CHARS]}" for s in chosen
+        )
+        others = [s["title"] for s in page["sections"] if s not in chosen]
+        if others:
+            body += "\n\nOther sections: " + "; ".join(others)
         formatted_docs.append(
-            f'<Document source="{src}" page="{page}">\n'
-            f'{text}\n'
+            f'<Document source="{page["url"]}" title="{page["title"]}" revision="{page["revid"]}">\n'
+            f'{body}\n'
             f'</Document>'
         )
 
@@ -38,5 +182,5 @@ if __name__ == "__main__":
 
     # Since @tool turned wiki_search into a BaseTool,
     # call invoke(input=...) rather than calling it directly.
-    result = wiki_search.invoke(input=query)
+    result = wiki_search.invoke(input={"query": query, "section": "History"})
     print(result)